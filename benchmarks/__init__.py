@@ -0,0 +1,4 @@
+"""Benchmarks for Network operations on generated road networks.
+
+Run with: python -m benchmarks.runner --output results.json
+"""
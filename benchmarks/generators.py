@@ -0,0 +1,53 @@
+"""Deterministic road network generators. Every generator takes a size and a seed
+and returns a list of ((x1, y1), (x2, y2)) segments that can be given to Network.add_roads_bulk()
+or drawn one by one with Network.add_point()."""
+
+import random
+
+# distance between parallel roads in a grid city
+GRID_SPACING = 2
+
+
+def grid_city(size: int, seed: int = 0) -> list:
+    """<size> horizontal and <size> vertical roads that all cross each other,
+    which makes size * size crossroads. Roads are added in a random order."""
+    end = (size - 1) * GRID_SPACING + 1
+    segments = []
+    for i in range(size):
+        position = i * GRID_SPACING
+        segments.append(((-1, position), (end, position)))
+        segments.append(((position, -1), (position, end)))
+    random.Random(seed).shuffle(segments)
+    return segments
+
+
+def random_crossings(size: int, seed: int = 0) -> list:
+    """<size> random segments in an area that grows with the amount of segments,
+    so each segment crosses a few others on average.
+    Some of the segments break the spacing rules and are not added."""
+    rng = random.Random(seed)
+    side = (size ** 0.5) * 4
+    segments = []
+    for _ in range(size):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        segments.append(((x, y), (x + rng.uniform(-5, 5), y + rng.uniform(-5, 5))))
+    return segments
+
+
+def long_chain(size: int, seed: int = 0) -> list:
+    """<size> segments connected end to end in a zigzag, which makes a path with <size> + 1 nodes."""
+    rng = random.Random(seed)
+    segments = []
+    previous = (0, 0)
+    for i in range(1, size + 1):
+        point = (i * GRID_SPACING, (i % 2) * GRID_SPACING + rng.uniform(-0.5, 0.5))
+        segments.append((previous, point))
+        previous = point
+    return segments
+
+
+GENERATORS = {"grid_city": grid_city, "random_crossings": random_crossings,
+              "long_chain": long_chain}
+# sizes used when none are given, chosen so that every network has roughly 100 to 2000 roads
+DEFAULT_SIZES = {"grid_city": [5, 10, 20], "random_crossings": [100, 400, 1600],
+                 "long_chain": [100, 400, 1600]}
@@ -0,0 +1,189 @@
+"""Times Network operations on generated networks and writes the results as JSON.
+
+python -m benchmarks.runner --generators grid_city --sizes 5 10 --output new.json --compare old.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from shapely import Point
+
+from src.transit_app.algorithms import ROUTING_ALGORITHMS
+from src.transit_app.instrumentation import metrics
+from src.transit_app.network import Network
+
+from .generators import DEFAULT_SIZES, GENERATORS
+
+# segments per add_roads_bulk() call
+BULK_CHUNK_SIZE = 100
+# origin and destination pairs per routing operation
+QUERY_AMOUNT = 50
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Returns the value at <fraction> of <sorted_values>, using the nearest rank."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations: list) -> dict:
+    """Returns call count, throughput and latency percentiles of <durations>, which are in seconds."""
+    values = sorted(durations)
+    total = sum(values)
+    return {
+        "calls": len(values),
+        "total_seconds": total,
+        "ops_per_second": len(values) / total if total > 0 else None,
+        "p50_ms": percentile(values, 0.5) * 1000,
+        "p90_ms": percentile(values, 0.9) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def timed(durations: list, function, *args, **kwargs):
+    """Calls <function>, appends its duration to <durations> and returns its result."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    durations.append(time.perf_counter() - start)
+    return result
+
+
+def build_one_by_one(segments: list, timings: dict) -> Network:
+    """Draws every segment with two add_point() calls, like clicking in the UI.
+    create_crossroads() is wrapped so that its calls are timed too."""
+    network = Network()
+    create_crossroads = network.create_crossroads
+    network.create_crossroads = lambda: timed(timings["create_crossroads"], create_crossroads)
+    for start, end in segments:
+        timed(timings["add_point"], network.add_point, Point(start))
+        timed(timings["add_point"], network.add_point, Point(end))
+        network.clear_temp()  # a rejected road leaves the first point as the start of the next one
+    return network
+
+
+def query_pairs(network: Network, seed: int) -> list:
+    """Returns pairs of points in the middle of random roads."""
+    rng = random.Random(seed)
+    points = [road.interpolate(0.5, normalized=True) for road in
+              rng.choices(network.roads, k=2 * QUERY_AMOUNT)]
+    return list(zip(points[0::2], points[1::2]))
+
+
+def run_case(segments: list, seed: int = 0) -> dict:
+    """Times every benchmarked operation on the network made of <segments>."""
+    timings = {"add_point": [], "create_crossroads": [], f"add_roads_bulk_{BULK_CHUNK_SIZE}": [],
+               "connected": [], "build_contraction_hierarchy": []}
+    timings.update({f"find_shortest_path_{algorithm}": []
+                    for algorithm in [*ROUTING_ALGORITHMS, "ch"]})
+
+    build_one_by_one(segments, timings)
+    network = Network()
+    for start in range(0, len(segments), BULK_CHUNK_SIZE):
+        timed(timings[f"add_roads_bulk_{BULK_CHUNK_SIZE}"], network.add_roads_bulk,
+              segments[start:start + BULK_CHUNK_SIZE])
+
+    pairs = query_pairs(network, seed)
+    for point1, point2 in pairs:
+        timed(timings["connected"], network.connected, point1, point2)
+    timed(timings["build_contraction_hierarchy"], network.build_contraction_hierarchy)
+    for algorithm in [*ROUTING_ALGORITHMS, "ch"]:
+        network.path_cache.clear()
+        for point1, point2 in pairs:
+            timed(timings[f"find_shortest_path_{algorithm}"],
+                  network.find_shortest_path, point1, point2, algorithm)
+
+    return {"segments": len(segments), "roads": len(network.roads),
+            "points": len(network.points),
+            "operations": {name: summarize(durations)
+                           for name, durations in timings.items() if durations}}
+
+
+def git_commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run(generators: list, sizes: list = None, seed: int = 0, log=None,
+        collect_metrics: bool = False) -> dict:
+    """Runs every generator at every size (or at its default sizes) and returns the results.
+    With <collect_metrics>, the timers and counters of every case are saved too,
+    which makes the operations a little slower."""
+    results = {"commit": git_commit(), "python": platform.python_version(),
+               "platform": platform.platform(),
+               "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+               "seed": seed, "cases": []}
+    for name in generators:
+        for size in sizes or DEFAULT_SIZES[name]:
+            segments = GENERATORS[name](size, seed)
+            with metrics.collecting(collect_metrics):
+                case = run_case(segments, seed)
+                if collect_metrics:
+                    case["metrics"] = metrics.report()
+            case.update({"generator": name, "size": size})
+            results["cases"].append(case)
+            if log:
+                log(format_case(case))
+    return results
+
+
+def format_case(case: dict, baseline: dict = None) -> str:
+    lines = [f"{case['generator']} size {case['size']}: {case['roads']} roads, "
+             f"{case['points']} points"]
+    for name, stats in case["operations"].items():
+        line = (f"  {name:<34} {stats['ops_per_second'] or 0:>12.1f} ops/s"
+                f"  p50 {stats['p50_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms")
+        old_stats = (baseline or {}).get(name)
+        if old_stats and old_stats["ops_per_second"] and stats["ops_per_second"]:
+            line += f"  {stats['ops_per_second'] / old_stats['ops_per_second']:>6.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def compare(results: dict, baseline: dict) -> str:
+    """Returns the results as text, with the change in ops/s compared to <baseline>
+    for every case and operation that both have."""
+    old_cases = {(case["generator"], case["size"]): case["operations"]
+                 for case in baseline["cases"]}
+    text = [f"Compared to commit {baseline.get('commit')}:"]
+    for case in results["cases"]:
+        text.append(format_case(case, old_cases.get((case["generator"], case["size"]))))
+    return "\n".join(text)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks Network operations.")
+    parser.add_argument("--generators", nargs="+", choices=list(GENERATORS),
+                        default=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        help="sizes for every generator, their default sizes if not given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--compare", help="earlier results to compare with")
+    parser.add_argument("--metrics", action="store_true",
+                        help="also save the timers and counters of every case")
+    args = parser.parse_args(argv)
+
+    results = run(args.generators, args.sizes, args.seed,
+                  log=None if args.compare else print, collect_metrics=args.metrics)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print(compare(results, json.load(file)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 from src.transit_app.network import Network
-from src.transit_app.ui import UI
 
 if __name__ == "__main__":
+    # the UI imports matplotlib and tkinter, which are only needed when the program is started
+    from src.transit_app.ui import UI
+
     ui = UI(Network())
     ui.start_ui()
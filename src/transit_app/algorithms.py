@@ -1,54 +1,444 @@
 """Copied from TIRA 2024 material."""
 
 import heapq
-import time
+import math
+from array import array
+from collections import deque
+from itertools import chain
+
+from .instrumentation import metrics
 
 
 class DFS:
+    """Graph traversal that uses an explicit stack instead of recursion,
+    so long chains of nodes don't hit Python's recursion limit.
+    Can also traverse breadth first, using a queue instead of the stack."""
+
     def __init__(self, nodes):
         self.nodes = nodes
         self.graph = {node: [] for node in nodes}
         self.visited = None
 
+    @classmethod
+    def from_graph(cls, graph: "Graph | CSRGraph"):
+        """Creates a DFS that traverses the edges of <graph>.
+        Edges of a Graph are used without copying them."""
+        dfs = cls([])
+        dfs.nodes = graph.nodes()
+        if isinstance(graph, Graph):
+            dfs.graph = graph.adjacency
+        else:
+            dfs.graph = {node: [neighbor for neighbor, _ in graph.neighbors(node)]
+                         for node in dfs.nodes}
+        return dfs
+
     def add_edge(self, a, b):
         self.graph[a].append(b)
         self.graph[b].append(a)
 
-    def visit(self, node):
-        if node in self.visited:
-            return
-        self.visited.add(node)
-
-        for next_node in self.graph[node]:
-            self.visit(next_node)
+    def traverse(self, start_node, breadth_first=False, visited=None):
+        """Returns the nodes reachable from start_node in the order they were visited.
+        Nodes in <visited> are skipped, and newly visited nodes are added to it."""
+        if visited is None:
+            visited = set()
+        if start_node in visited:
+            return []
+        order = []
+        if breadth_first:
+            visited.add(start_node)
+            queue = deque([start_node])
+            while queue:
+                node = queue.popleft()
+                order.append(node)
+                for next_node in self.graph[node]:
+                    if next_node not in visited:
+                        visited.add(next_node)
+                        queue.append(next_node)
+        else:
+            stack = [start_node]
+            while stack:
+                node = stack.pop()
+                if node in visited:
+                    continue
+                visited.add(node)
+                order.append(node)
+                for next_node in reversed(self.graph[node]):
+                    if next_node not in visited:
+                        stack.append(next_node)
+        return order
 
-    def search(self, start_node):
+    def search(self, start_node, breadth_first=False):
         self.visited = set()
-        self.visit(start_node)
+        self.traverse(start_node, breadth_first, self.visited)
         return self.visited
 
+    def label_components(self):
+        """Returns {node: label} for every node, where nodes connected to each other have the same label.
+        Labels are 0, 1, 2... in the order the components are found."""
+        labels = {}
+        visited = set()
+        label = 0
+        for node in self.graph:
+            if node in visited:
+                continue
+            for component_node in self.traverse(node, visited=visited):
+                labels[component_node] = label
+            label += 1
+        return labels
 
-class Dijkstra:
-    """Does not take nodes when initialized, they have to be added with add_node()!"""
+
+class DisjointSet:
+    """Union-find structure with path compression and union by size.
+    Nodes are added automatically the first time they are used.
+    Sets can only be merged, never split."""
+
+    def __init__(self) -> None:
+        self.parents = {}
+        self.sizes = {}
+        self.count = 0  # amount of separate sets
+
+    @classmethod
+    def from_roots(cls, nodes, roots):
+        """Returns a DisjointSet where each node in <nodes> is in the set of the matching node in <roots>."""
+        disjoint_set = cls()
+        disjoint_set.parents = dict(zip(nodes, roots))
+        for root in disjoint_set.parents.values():
+            disjoint_set.sizes[root] = disjoint_set.sizes.get(root, 0) + 1
+        disjoint_set.count = len(disjoint_set.sizes)
+        return disjoint_set
+
+    def __contains__(self, node) -> bool:
+        return node in self.parents
+
+    def add(self, node):
+        if node not in self.parents:
+            self.parents[node] = node
+            self.sizes[node] = 1
+            self.count += 1
+
+    def find(self, node):
+        """Returns the representative node of the set that <node> is in."""
+        self.add(node)
+        root = node
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[node] != root:
+            self.parents[node], node = root, self.parents[node]
+        return root
+
+    def union(self, node_a, node_b):
+        """Merges the sets that node_a and node_b are in."""
+        root_a = self.find(node_a)
+        root_b = self.find(node_b)
+        if root_a == root_b:
+            return
+        if self.sizes[root_a] < self.sizes[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parents[root_b] = root_a
+        self.sizes[root_a] += self.sizes[root_b]
+        del self.sizes[root_b]
+        self.count -= 1
+
+    def connected(self, node_a, node_b) -> bool:
+        if node_a not in self.parents or node_b not in self.parents:
+            return False
+        return self.find(node_a) == self.find(node_b)
+
+
+class Graph:
+    """Weighted directed graph stored as {node: {neighbor: weight}}.
+    Edges can be added and removed in O(1), so the graph can be kept up to date while roads change.
+    Roads go both ways, so the network adds every edge in both directions."""
+
+    def __init__(self) -> None:
+        self.adjacency = {}
+
+    def __contains__(self, node) -> bool:
+        return node in self.adjacency
+
+    def __len__(self) -> int:
+        return len(self.adjacency)
+
+    def nodes(self):
+        return self.adjacency.keys()
+
+    def neighbors(self, node):
+        """Returns (neighbor, weight) pairs of every edge that starts from <node>."""
+        return self.adjacency[node].items()
+
+    def position(self, node) -> tuple:
+        """Returns the (x, y) coordinates of <node>. Nodes are their own coordinates."""
+        return node
+
+    def degree(self, node) -> int:
+        """Returns the amount of edges that start from <node>."""
+        return len(self.adjacency[node])
+
+    def has_edge(self, node_a, node_b) -> bool:
+        return node_a in self.adjacency and node_b in self.adjacency[node_a]
+
+    def add_node(self, node):
+        if node not in self.adjacency:
+            self.adjacency[node] = {}
+
+    def add_edge(self, node_a, node_b, weight):
+        """Adds an edge from node_a to node_b, and the nodes if they don't exist yet.
+        If the edge already exists, the smaller weight is kept."""
+        self.add_node(node_a)
+        self.add_node(node_b)
+        edges = self.adjacency[node_a]
+        if node_b not in edges or weight < edges[node_b]:
+            edges[node_b] = weight
+
+    def remove_edge(self, node_a, node_b):
+        """Removes the edge from node_a to node_b, if it exists. The nodes are not removed."""
+        if node_a in self.adjacency:
+            self.adjacency[node_a].pop(node_b, None)
+
+    def remove_node(self, node):
+        """Removes <node> and every edge between it and its neighbors."""
+        if node not in self.adjacency:
+            return
+        for neighbor in self.adjacency.pop(node):
+            if neighbor in self.adjacency:
+                self.adjacency[neighbor].pop(node, None)
+
+
+class CSRGraph:
+    """Weighted directed graph where nodes are integer IDs and edges are stored in flat arrays
+    (compressed sparse row format): the edges of node i go to targets[offsets[i]:offsets[i + 1]]
+    and have weights weights[offsets[i]:offsets[i + 1]]. Node i is at (positions[2 * i], positions[2 * i + 1]).
+    This takes a fraction of the memory of a dict based Graph.
+    The arrays are not changed after they are built. Edges added later are kept in a dict,
+    and removed edges are only marked as removed, like in SpatialIndex.
+    Nodes added later get IDs after the nodes in the arrays, and the IDs of removed ones are used again.
+    compact() builds the arrays again, which renumbers the nodes."""
+
+    # compact_if_needed() rebuilds the arrays when more than this fraction of the edges has changed
+    MAX_CHANGED_FRACTION = 0.25
+    MIN_CHANGES = 64
 
     def __init__(self) -> None:
-        self.graph = {}
+        self.node_ids = {}  # (x, y): node ID
+        self.positions = array("d")
+        self.new_positions = array("d")  # positions of nodes added after the arrays were built
+        self.free_ids = []  # IDs of removed nodes that are not in the arrays
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        self.weights = array("d")
+        self.added = {}  # node ID: {neighbor: weight} for edges that are not in the arrays
+        self.removed = {}  # node ID: neighbors whose edges in the arrays have been removed
+        self.edge_count = 0
+        self.changes = 0  # edges added or removed after the arrays were built
+
+    @classmethod
+    def from_graph(cls, graph: Graph):
+        """Returns a CSRGraph with the same edges as <graph>, whose nodes must be (x, y) tuples."""
+        csr_graph = cls()
+        for node in graph.nodes():
+            node_id = csr_graph.add_node(node)
+            for neighbor, weight in graph.neighbors(node):
+                csr_graph.add_edge(node_id, csr_graph.add_node(neighbor), weight)
+        csr_graph.compact()
+        return csr_graph
+
+    @classmethod
+    def from_arrays(cls, positions, offsets, targets, weights):
+        """Returns a CSRGraph that uses the given arrays without copying them.
+        The arrays can be read-only, like memoryviews of a memory-mapped file,
+        since they are only replaced, never changed."""
+        csr_graph = cls()
+        csr_graph.positions = positions
+        csr_graph.offsets = offsets
+        csr_graph.targets = targets
+        csr_graph.weights = weights
+        csr_graph.node_ids = {position: node_id for node_id, position
+                              in enumerate(zip(positions[0::2], positions[1::2]))}
+        csr_graph.edge_count = len(targets)
+        return csr_graph
+
+    def __contains__(self, node) -> bool:
+        return 0 <= node < (len(self.positions) + len(self.new_positions)) // 2
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def nodes(self):
+        return self.node_ids.values()
+
+    def node_id(self, position: tuple):
+        """Returns the ID of the node at <position>, or None if there is no node."""
+        return self.node_ids.get(position)
+
+    def position(self, node) -> tuple:
+        index = 2 * node - len(self.positions)
+        if index < 0:
+            return (self.positions[2 * node], self.positions[2 * node + 1])
+        return (self.new_positions[index], self.new_positions[index + 1])
+
+    def add_node(self, position: tuple) -> int:
+        """Adds a node at <position> if there isn't one already, and returns its ID."""
+        node_id = self.node_ids.get(position)
+        if node_id is None:
+            # the arrays are never changed here, since they can be read-only (see from_arrays())
+            if self.free_ids:
+                node_id = self.free_ids.pop()
+                index = 2 * node_id - len(self.positions)
+                self.new_positions[index:index + 2] = array("d", position)
+            else:
+                node_id = (len(self.positions) + len(self.new_positions)) // 2
+                self.new_positions.extend(position)
+            self.node_ids[position] = node_id
+        return node_id
+
+    def remove_node(self, node, temporary: bool = False):
+        """Removes <node> and every edge between it and its neighbors.
+        IDs of nodes in the arrays are not used again before the next compact(),
+        the IDs of other nodes are given to the next added nodes.
+        See add_edge() for <temporary>."""
+        for neighbor, _ in list(self.neighbors(node)):
+            self.remove_edge(node, neighbor, temporary)
+            self.remove_edge(neighbor, node, temporary)
+        position = self.position(node)
+        if self.node_ids.get(position) == node:
+            del self.node_ids[position]
+            if 2 * node >= len(self.positions):
+                self.free_ids.append(node)
+
+    def _array_edges(self, node):
+        if node + 1 >= len(self.offsets):
+            return ()
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def _array_weight(self, node_a, node_b):
+        """Returns the weight of the edge from node_a to node_b in the arrays, or None."""
+        for neighbor, weight in self._array_edges(node_a):
+            if neighbor == node_b:
+                return weight
+        return None
+
+    def neighbors(self, node):
+        """Returns (neighbor, weight) pairs of every edge that starts from <node>."""
+        edges = self._array_edges(node)
+        removed = self.removed.get(node)
+        if removed:
+            edges = [(neighbor, weight) for neighbor, weight in edges
+                     if neighbor not in removed]
+        added = self.added.get(node)
+        if added:
+            return chain(edges, added.items())
+        return edges
+
+    def degree(self, node) -> int:
+        """Returns the amount of edges that start from <node>."""
+        return sum(1 for _ in self.neighbors(node))
+
+    def has_edge(self, node_a, node_b) -> bool:
+        if node_b in self.added.get(node_a, ()):
+            return True
+        return node_b not in self.removed.get(node_a, ()) and \
+            self._array_weight(node_a, node_b) is not None
+
+    def add_edge(self, node_a, node_b, weight, temporary: bool = False):
+        """Adds an edge from node_a to node_b. If the edge already exists, the smaller weight is kept.
+        <temporary> edges, like the ones added for a single query, are not counted as changes
+        in compact_if_needed()."""
+        added = self.added.get(node_a)
+        if added and node_b in added:
+            added[node_b] = min(added[node_b], weight)
+            return
+        array_weight = None
+        if node_b not in self.removed.get(node_a, ()):
+            array_weight = self._array_weight(node_a, node_b)
+        if array_weight is not None:
+            if array_weight <= weight:
+                return
+            # the edge in the arrays is replaced by the added edge
+            self.removed.setdefault(node_a, set()).add(node_b)
+            self.edge_count -= 1
+        self.added.setdefault(node_a, {})[node_b] = weight
+        self.edge_count += 1
+        if not temporary:
+            self.changes += 1
+
+    def remove_edge(self, node_a, node_b, temporary: bool = False):
+        """Removes the edge from node_a to node_b, if it exists. The nodes are not removed.
+        See add_edge() for <temporary>."""
+        added = self.added.get(node_a)
+        if added and node_b in added:
+            del added[node_b]
+            if not added:
+                del self.added[node_a]
+        elif node_b not in self.removed.get(node_a, ()) and \
+                self._array_weight(node_a, node_b) is not None:
+            self.removed.setdefault(node_a, set()).add(node_b)
+        else:
+            return
+        self.edge_count -= 1
+        if not temporary:
+            self.changes += 1
+
+    def compact(self):
+        """Builds the arrays again from every edge, and gives the nodes new IDs from 0 upwards."""
+        compacted = self.compacted()
+        self.node_ids = compacted.node_ids
+        self.positions = compacted.positions
+        self.new_positions = array("d")
+        self.free_ids = []
+        self.offsets = compacted.offsets
+        self.targets = compacted.targets
+        self.weights = compacted.weights
+        self.added = {}
+        self.removed = {}
+        self.edge_count = compacted.edge_count
+        self.changes = 0
+
+    def compacted(self):
+        """Returns a new CSRGraph with the same edges, whose arrays contain every edge
+        and whose nodes have new IDs from 0 upwards. This graph is not changed."""
+        old_ids = list(self.node_ids.items())
+        new_ids = {old_id: new_id for new_id,
+                   (_, old_id) in enumerate(old_ids)}
+        compacted = CSRGraph()
+        for position, old_id in old_ids:
+            compacted.positions.extend(position)
+            for neighbor, weight in self.neighbors(old_id):
+                compacted.targets.append(new_ids[neighbor])
+                compacted.weights.append(weight)
+            compacted.offsets.append(len(compacted.targets))
+        compacted.node_ids = {position: new_ids[old_id]
+                              for position, old_id in old_ids}
+        compacted.edge_count = len(compacted.targets)
+        return compacted
+
+    def compact_if_needed(self) -> bool:
+        """Calls compact() if many edges have changed since the arrays were built.
+        Returns True if the nodes were renumbered."""
+        if self.changes > max(self.MIN_CHANGES, self.MAX_CHANGED_FRACTION * self.edge_count):
+            self.compact()
+            return True
+        return False
+
+
+class Dijkstra:
+    """Nodes can be added with add_node(), or an existing Graph can be given when initialized.
+    The graph is not copied, so changes to it are seen by later searches."""
+
+    def __init__(self, graph: Graph = None) -> None:
+        self.graph = graph if graph is not None else Graph()
         self.distances = {}
 
     def add_node(self, node):
-        if node not in self.graph.keys():
-            self.graph[node] = []
+        self.graph.add_node(node)
 
     def add_edge(self, node_a, node_b, weight):
-        if (node_b, weight) not in self.graph[node_a]:
-            self.graph[node_a].append((node_b, weight))
+        self.graph.add_edge(node_a, node_b, weight)
 
     def find_distances(self, start_node, end_node):
-        """Returns shortest path between start_node and end_node, and the distance from start_node to end_node."""
-        start_time = time.time()
+        """Returns shortest path between start_node and end_node, and the distance from start_node to end_node.
+        Only nodes reached by the search are given a distance, other nodes are at infinite distance."""
         self.distances = {}
-        for node in self.graph.keys():
-            self.distances[node] = float("inf")
         self.distances[start_node] = 0
         previous = {}
         previous[start_node] = None
@@ -57,30 +447,499 @@ class Dijkstra:
         heapq.heappush(queue, (0, start_node))
 
         visited = set()
+        relaxed = 0
         while queue:
             node_a = heapq.heappop(queue)[1]
             if node_a in visited:
                 continue
             visited.add(node_a)
 
-            for node_b, weight in self.graph[node_a]:
+            for node_b, weight in self.graph.neighbors(node_a):
                 new_distance = self.distances[node_a] + weight
-                if new_distance < self.distances[node_b]:
+                if new_distance < self.distances.get(node_b, float("inf")):
                     self.distances[node_b] = new_distance
                     previous[node_b] = node_a
                     new_pair = (new_distance, node_b)
                     heapq.heappush(queue, new_pair)
+                    relaxed += 1
+        if metrics.enabled:
+            count_search("dijkstra", len(visited), relaxed)
 
-        if self.distances[end_node] == float("inf"):
+        if end_node not in self.distances:
             return None
 
-        path = []
-        node = end_node
-        while node:
-            path.append(node)
-            node = previous[node]
-
-        path.reverse()
-        end_time = time.time()
-        print(f"TIME FOR FIND_DISTANCES(): {end_time - start_time}")
+        path = build_path(previous, end_node)
         return (path, self.distances[end_node])
+
+    def search(self, sources: dict, targets=None):
+        """Runs Dijkstra's algorithm from every node in <sources> at once.
+        <sources> are {node: distance} pairs, the distance is added to every path from that node.
+        Stops when every node in <targets> has been visited, or goes through the whole graph
+        if <targets> is None. Returns {node: distance} and {node: previous node} pairs."""
+        self.distances = {}
+        previous = {}
+        queue = []
+        for node, distance in sources.items():
+            if node in self.graph and distance < self.distances.get(node, float("inf")):
+                self.distances[node] = distance
+                previous[node] = None
+                heapq.heappush(queue, (distance, node))
+
+        unvisited_targets = None if targets is None else set(targets)
+        visited = set()
+        relaxed = 0
+        while queue:
+            if unvisited_targets is not None and not unvisited_targets:
+                break
+            node_a = heapq.heappop(queue)[1]
+            if node_a in visited:
+                continue
+            visited.add(node_a)
+            if unvisited_targets is not None:
+                unvisited_targets.discard(node_a)
+
+            for node_b, weight in self.graph.neighbors(node_a):
+                new_distance = self.distances[node_a] + weight
+                if new_distance < self.distances.get(node_b, float("inf")):
+                    self.distances[node_b] = new_distance
+                    previous[node_b] = node_a
+                    heapq.heappush(queue, (new_distance, node_b))
+                    relaxed += 1
+        if metrics.enabled:
+            count_search("dijkstra", len(visited), relaxed)
+        return self.distances, previous
+
+
+class AStar(Dijkstra):
+    """Dijkstra's algorithm that stops when end_node is reached,
+    and visits nodes in order of distance from start_node plus the straight-line distance to end_node.
+    Every edge must be at least as long as the straight-line distance between its nodes,
+    which is true for roads because they are straight lines."""
+
+    def heuristic(self, node, end_node) -> float:
+        return math.dist(self.graph.position(node), self.graph.position(end_node))
+
+    def find_distances(self, start_node, end_node):
+        """Returns shortest path between start_node and end_node, and the distance from start_node to end_node.
+        Only nodes reached by the search are given a distance."""
+        self.distances = {}
+        self.distances[start_node] = 0
+        previous = {}
+        previous[start_node] = None
+
+        queue = []
+        heapq.heappush(
+            queue, (self.heuristic(start_node, end_node), start_node))
+
+        visited = set()
+        relaxed = 0
+        result = None
+        while queue:
+            node_a = heapq.heappop(queue)[1]
+            if node_a == end_node:
+                result = (build_path(previous, end_node), self.distances[end_node])
+                break
+            if node_a in visited:
+                continue
+            visited.add(node_a)
+
+            for node_b, weight in self.graph.neighbors(node_a):
+                new_distance = self.distances[node_a] + weight
+                if new_distance < self.distances.get(node_b, float("inf")):
+                    self.distances[node_b] = new_distance
+                    previous[node_b] = node_a
+                    estimate = new_distance + self.heuristic(node_b, end_node)
+                    heapq.heappush(queue, (estimate, node_b))
+                    relaxed += 1
+        if metrics.enabled:
+            count_search("astar", len(visited), relaxed)
+        return result
+
+
+class BidirectionalDijkstra(Dijkstra):
+    """Runs Dijkstra's algorithm forward from start_node and backward from end_node,
+    always continuing the search whose next node is nearer, until the searches meet.
+    Roads go both ways, so the backward search uses the same edges as the forward search."""
+
+    def find_distances(self, start_node, end_node):
+        """Returns shortest path between start_node and end_node, and the distance from start_node to end_node.
+        self.distances contains the distances found by the forward search."""
+        distances = ({start_node: 0}, {end_node: 0})
+        previous = ({start_node: None}, {end_node: None})
+        queues = ([(0, start_node)], [(0, end_node)])
+        visited = (set(), set())
+        self.distances = distances[0]
+
+        # shortest known distance through a node that both searches have reached
+        best_distance = 0 if start_node == end_node else float("inf")
+        meeting_node = start_node if start_node == end_node else None
+        relaxed = 0
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best_distance:
+                # no path through unvisited nodes can be shorter than the best one
+                break
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            node_a = heapq.heappop(queues[side])[1]
+            if node_a in visited[side]:
+                continue
+            visited[side].add(node_a)
+
+            for node_b, weight in self.graph.neighbors(node_a):
+                new_distance = distances[side][node_a] + weight
+                if new_distance < distances[side].get(node_b, float("inf")):
+                    distances[side][node_b] = new_distance
+                    previous[side][node_b] = node_a
+                    heapq.heappush(queues[side], (new_distance, node_b))
+                    relaxed += 1
+                    if node_b in distances[1 - side] and \
+                            new_distance + distances[1 - side][node_b] < best_distance:
+                        best_distance = new_distance + \
+                            distances[1 - side][node_b]
+                        meeting_node = node_b
+        if metrics.enabled:
+            count_search("bidirectional", len(visited[0]) + len(visited[1]), relaxed)
+
+        if meeting_node is None:
+            return None
+        path = build_path(previous[0], meeting_node)
+        backward_path = build_path(previous[1], meeting_node)
+        path += reversed(backward_path[:-1])
+        return (path, best_distance)
+
+
+class ContractionHierarchy:
+    """Preprocessed version of a graph that answers shortest path queries quickly.
+    build() contracts the nodes one at a time, from least to most important,
+    and adds shortcut edges that keep the distances between the remaining nodes the same.
+    A query then only searches upward (towards more important nodes) from both ends.
+    The graph must have edges in both directions, like the road network does.
+    Changes to the graph after build() are not seen, so the hierarchy has to be built again."""
+
+    # how many nodes a witness search can settle before giving up and adding a shortcut
+    WITNESS_SETTLE_LIMIT = 50
+
+    def __init__(self, graph: Graph) -> None:
+        self.graph = graph
+        self.rank = {}  # node: order of contraction
+        self.upward = {}  # node: {more important neighbor: weight}
+        self.middle = {}  # (node_a, node_b): node that shortcut edge node_a -> node_b skips
+
+    def build(self):
+        """Contracts every node of the graph. Returns self."""
+        remaining = {node: dict(self.graph.neighbors(node))
+                     for node in self.graph.nodes()}
+        # how many neighbors of each node have been contracted, and the level of each node
+        # (one more than the highest level of its contracted neighbors)
+        contracted_neighbors = {node: 0 for node in remaining}
+        levels = {node: 0 for node in remaining}
+        self.rank = {}
+        self.upward = {}
+        self.middle = {}
+
+        queue = [(self._priority(node, self._shortcuts(node, remaining),
+                                 remaining, contracted_neighbors, levels), node)
+                 for node in remaining]
+        heapq.heapify(queue)
+        while queue:
+            node = heapq.heappop(queue)[1]
+            if node in self.rank:
+                continue
+            # priorities change when neighbors are contracted, so they are updated lazily
+            shortcuts = self._shortcuts(node, remaining)
+            priority = self._priority(
+                node, shortcuts, remaining, contracted_neighbors, levels)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))
+                continue
+            for neighbor in remaining[node]:
+                contracted_neighbors[neighbor] += 1
+                levels[neighbor] = max(levels[neighbor], levels[node] + 1)
+            self._contract(node, shortcuts, remaining)
+        if metrics.enabled:
+            metrics.count("contraction_hierarchy.nodes", len(self.rank))
+            metrics.count("contraction_hierarchy.shortcuts", len(self.middle) // 2)
+        return self
+
+    def _shortcuts(self, node, remaining: dict) -> list:
+        """Returns (node_a, node_b, weight) shortcuts that are needed if <node> is contracted."""
+        shortcuts = []
+        neighbors = list(remaining[node].items())
+        for i, (node_a, weight_a) in enumerate(neighbors):
+            targets = {node_b: weight_a + weight_b
+                       for node_b, weight_b in neighbors[i + 1:]}
+            if not targets:
+                continue
+            witness = self._witness_search(
+                node_a, node, targets, remaining)
+            for node_b, weight in targets.items():
+                if witness.get(node_b, float("inf")) > weight:
+                    shortcuts.append((node_a, node_b, weight))
+        return shortcuts
+
+    def _witness_search(self, start_node, skipped_node, targets: dict, remaining: dict) -> dict:
+        """Dijkstra's algorithm from start_node that does not go through skipped_node.
+        Stops when every node in <targets> ({node: distance through skipped_node}) is visited,
+        when the path through skipped_node is shorter than any unvisited node,
+        or after WITNESS_SETTLE_LIMIT nodes."""
+        if metrics.enabled:
+            metrics.count("contraction_hierarchy.witness_searches")
+        max_distance = max(targets.values())
+        unvisited_targets = set(targets)
+        distances = {start_node: 0}
+        queue = [(0, start_node)]
+        visited = set()
+        while queue and unvisited_targets and len(visited) < self.WITNESS_SETTLE_LIMIT:
+            distance, node_a = heapq.heappop(queue)
+            if distance > max_distance:
+                break
+            if node_a in visited:
+                continue
+            visited.add(node_a)
+            unvisited_targets.discard(node_a)
+            for node_b, weight in remaining[node_a].items():
+                if node_b == skipped_node:
+                    continue
+                new_distance = distance + weight
+                if new_distance < distances.get(node_b, float("inf")):
+                    distances[node_b] = new_distance
+                    heapq.heappush(queue, (new_distance, node_b))
+        return distances
+
+    def _priority(self, node, shortcuts: list, remaining: dict,
+                  contracted_neighbors: dict, levels: dict) -> int:
+        """Nodes that add few shortcuts compared to the edges they remove are contracted first.
+        Counting contracted neighbors and levels spreads the contracted nodes evenly around the graph."""
+        return 2 * (len(shortcuts) - len(remaining[node])) + contracted_neighbors[node] + levels[node]
+
+    def _contract(self, node, shortcuts: list, remaining: dict):
+        for node_a, node_b, weight in shortcuts:
+            if weight < remaining[node_a].get(node_b, float("inf")):
+                remaining[node_a][node_b] = weight
+                remaining[node_b][node_a] = weight
+                self.middle[(node_a, node_b)] = node
+                self.middle[(node_b, node_a)] = node
+        self.rank[node] = len(self.rank)
+        self.upward[node] = remaining.pop(node)
+        for neighbor in self.upward[node]:
+            del remaining[neighbor][node]
+
+    def query(self, sources: dict, targets: dict):
+        """Returns shortest path from any node in <sources> to any node in <targets>, and its length.
+        <sources> and <targets> are {node: distance} pairs, the distance is added to the path length.
+        Returns None if no path exists."""
+        forward, forward_previous = self._upward_search(sources)
+        backward, backward_previous = self._upward_search(targets)
+        best_distance = float("inf")
+        meeting_node = None
+        for node, distance in forward.items():
+            if node in backward and distance + backward[node] < best_distance:
+                best_distance = distance + backward[node]
+                meeting_node = node
+        if meeting_node is None:
+            return None
+
+        path = build_path(forward_previous, meeting_node)
+        backward_path = build_path(backward_previous, meeting_node)
+        path += reversed(backward_path[:-1])
+        return (self._unpack(path), best_distance)
+
+    def find_distances(self, start_node, end_node):
+        """Returns shortest path between start_node and end_node, and the distance from start_node to end_node."""
+        return self.query({start_node: 0}, {end_node: 0})
+
+    def _upward_search(self, sources: dict):
+        """Dijkstra's algorithm that only follows upward edges.
+        Returns {node: distance} and {node: previous node} pairs of every node it reached."""
+        distances = {}
+        previous = {}
+        queue = []
+        for node, distance in sources.items():
+            if node in self.upward and distance < distances.get(node, float("inf")):
+                distances[node] = distance
+                previous[node] = None
+                heapq.heappush(queue, (distance, node))
+        visited = set()
+        relaxed = 0
+        while queue:
+            node_a = heapq.heappop(queue)[1]
+            if node_a in visited:
+                continue
+            visited.add(node_a)
+            for node_b, weight in self.upward[node_a].items():
+                new_distance = distances[node_a] + weight
+                if new_distance < distances.get(node_b, float("inf")):
+                    distances[node_b] = new_distance
+                    previous[node_b] = node_a
+                    heapq.heappush(queue, (new_distance, node_b))
+                    relaxed += 1
+        if metrics.enabled:
+            count_search("contraction_hierarchy", len(visited), relaxed)
+        return distances, previous
+
+    def _unpack(self, path: list) -> list:
+        """Replaces shortcut edges in <path> with the original edges that they skip."""
+        unpacked = [path[0]]
+        stack = list(zip(path[1:], path[:-1]))
+        stack.reverse()
+        while stack:
+            node_b, node_a = stack.pop()
+            middle = self.middle.get((node_a, node_b))
+            if middle is None:
+                unpacked.append(node_b)
+            else:
+                stack.append((node_b, middle))
+                stack.append((middle, node_a))
+        return unpacked
+
+
+def segment_intersection(segment_a: tuple, segment_b: tuple):
+    """Returns the (x, y) point where two segments intersect, or None if they don't.
+    Segments are ((x1, y1), (x2, y2)) pairs. If the segments are on the same line and overlap,
+    returns the overlapping part as a segment instead of a point.
+    A shared ending point is returned exactly as it is in the segments."""
+    segment_a, segment_b = tuple(segment_a), tuple(segment_b)
+    (x1, y1), (x2, y2) = segment_a
+    (x3, y3), (x4, y4) = segment_b
+    shared = [end for end in segment_a if end in segment_b]
+    if len(shared) == 1:
+        # segments that share one ending point only meet there, unless they are on the same line
+        (sx, sy), (ox, oy) = shared[0], segment_a[segment_a.index(shared[0]) - 1]
+        (px, py) = segment_b[segment_b.index(shared[0]) - 1]
+        if (ox - sx) * (py - sy) - (oy - sy) * (px - sx) != 0:
+            return shared[0]
+    dx_a, dy_a = x2 - x1, y2 - y1
+    dx_b, dy_b = x4 - x3, y4 - y3
+    denominator = dx_a * dy_b - dy_a * dx_b
+    if denominator == 0:
+        if (x3 - x1) * dy_a - (y3 - y1) * dx_a != 0:
+            return None  # parallel
+        # on the same line, compare positions along segment_a
+        length = dx_a * dx_a + dy_a * dy_a
+        if length == 0:
+            return None
+        t3 = ((x3 - x1) * dx_a + (y3 - y1) * dy_a) / length
+        t4 = ((x4 - x1) * dx_a + (y4 - y1) * dy_a) / length
+        if max(t3, t4) < 0 or min(t3, t4) > 1:
+            return None
+        ends = sorted([(0.0, segment_a[0]), (1.0, segment_a[1]),
+                       (t3, segment_b[0]), (t4, segment_b[1])])
+        start, end = ends[1], ends[2]
+        if start[0] == end[0]:
+            return start[1]
+        return (start[1], end[1])
+
+    t = ((x3 - x1) * dy_b - (y3 - y1) * dx_b) / denominator
+    u = ((x3 - x1) * dy_a - (y3 - y1) * dx_a) / denominator
+    if not (0 <= t <= 1 and 0 <= u <= 1):
+        return None
+    if t == 0:
+        return segment_a[0]
+    if t == 1:
+        return segment_a[1]
+    if u == 0:
+        return segment_b[0]
+    if u == 1:
+        return segment_b[1]
+    return (x1 + t * dx_a, y1 + t * dy_a)
+
+
+def find_segment_crossings(segments: list, tolerance: float = 0) -> list:
+    """Returns (i, j, intersection) for every pair of segments i < j in <segments> that intersect,
+    sorted by i and j. <intersection> is what segment_intersection() returns for the pair.
+    With <tolerance>, pairs whose bounding boxes are within <tolerance> of each other are returned too,
+    with None as the intersection if they don't intersect.
+    A vertical line sweeps from left to right, and each segment is only compared with the segments
+    that the line is crossing when the segment starts, and whose y ranges overlap with it."""
+    boxes = []  # (min x, max x, min y, max y) of every segment
+    for (x1, y1), (x2, y2) in segments:
+        boxes.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2)))
+    starts = sorted(range(len(segments)), key=lambda i: boxes[i][0])
+    active = []  # heap of (largest x, segment index)
+    crossings = []
+    for i in starts:
+        min_x, max_x, min_y, max_y = boxes[i]
+        while active and active[0][0] + tolerance < min_x:
+            heapq.heappop(active)
+        min_y -= tolerance
+        max_y += tolerance
+        for _, j in active:
+            box = boxes[j]
+            if box[3] < min_y or box[2] > max_y:
+                continue
+            a, b = (i, j) if i < j else (j, i)
+            crossing = segment_intersection(segments[a], segments[b])
+            if crossing is not None or tolerance > 0:
+                crossings.append((a, b, crossing))
+        heapq.heappush(active, (max_x, i))
+    crossings.sort(key=lambda crossing: (crossing[0], crossing[1]))
+    return crossings
+
+
+def merge_collinear_segments(segments: list, tolerance: float = 1e-9) -> list:
+    """Joins segments that continue each other in a straight line, like the parts of a road
+    that crossroads have split. <segments> are ((x1, y1), (x2, y2)) pairs, and so are the returned segments.
+    Two segments are joined if they share an ending point and their directions differ by at most
+    <tolerance> (as the sine of the angle between them)."""
+    directions = []
+    ends = {}  # point: [(segment index, unit vector from the point along the segment)]
+    for index, (start, end) in enumerate(segments):
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            directions.append(None)
+            continue
+        dx, dy = dx / length, dy / length
+        directions.append((dx, dy))
+        ends.setdefault(start, []).append((index, dx, dy))
+        ends.setdefault(end, []).append((index, -dx, -dy))
+
+    joined = DisjointSet()
+    for index, direction in enumerate(directions):
+        if direction is not None:
+            joined.add(index)
+    for segments_at_point in ends.values():
+        for i, (index_a, dx_a, dy_a) in enumerate(segments_at_point):
+            for index_b, dx_b, dy_b in segments_at_point[i + 1:]:
+                # the segments leave the point in opposite directions
+                if abs(dx_a * dy_b - dy_a * dx_b) <= tolerance and dx_a * dx_b + dy_a * dy_b < 0:
+                    joined.union(index_a, index_b)
+
+    groups = {}
+    for index, direction in enumerate(directions):
+        if direction is not None:
+            groups.setdefault(joined.find(index), []).append(index)
+    merged = []
+    for indices in groups.values():
+        if len(indices) == 1:
+            merged.append(segments[indices[0]])
+            continue
+        dx, dy = directions[indices[0]]
+        points = [point for index in indices for point in segments[index]]
+        merged.append((min(points, key=lambda point: point[0] * dx + point[1] * dy),
+                       max(points, key=lambda point: point[0] * dx + point[1] * dy)))
+    return merged
+
+
+def count_search(name: str, settled: int, relaxed: int):
+    """Adds one search with <settled> visited nodes and <relaxed> shortened distances
+    to the counters of <name>."""
+    metrics.count(f"{name}.searches")
+    metrics.count(f"{name}.nodes_settled", settled)
+    metrics.count(f"{name}.edges_relaxed", relaxed)
+
+
+def build_path(previous: dict, end_node) -> list:
+    """Returns the nodes from the start of a search to <end_node>,
+    using the {node: previous node} pairs saved during the search."""
+    path = []
+    node = end_node
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    path.reverse()
+    return path
+
+
+# Algorithms that Network.find_shortest_path() can use
+ROUTING_ALGORITHMS = {"dijkstra": Dijkstra, "astar": AStar,
+                      "bidirectional": BidirectionalDijkstra}
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+
+
+class ShortestPathCache:
+    """Least recently used cache of ShortestPathOutput objects.
+    Every entry is tagged with the network version it was calculated for,
+    and entries from an older version are treated as misses."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size  # 0 disables the cache
+        self.entries = OrderedDict()  # key: (version, output) pairs
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key, version: int):
+        """Returns the output saved for <key> in <version> of the network, or None."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version: int, output):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (version, output)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,55 @@
+from enum import Enum
+from typing import NamedTuple
+
+
+class ChangeKind(Enum):
+    ROAD = "road"
+    POINT = "point"
+    TEMP_POINT = "temp_point"
+    CALCULATION_POINT = "calculation_point"
+    HIGHLIGHTED_PATH = "highlighted_path"
+
+
+class Change(NamedTuple):
+    kind: ChangeKind
+    item: object  # the geometry that was added or removed
+    added: bool
+
+
+class ChangeLog:
+    """Geometries added to and removed from a Network since the last drain().
+    Nothing is recorded until start() is called, so a network without a UI does not collect changes.
+    Changes are merged by geometry: something that is added and removed before drain()
+    does not show up at all."""
+
+    def __init__(self) -> None:
+        self.recording = False
+        self._changes = {}  # (kind, item): 1 for added, -1 for removed, 0 for no change
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+        self._changes = {}
+
+    def __len__(self) -> int:
+        return sum(1 for change in self._changes.values() if change)
+
+    def add(self, kind: ChangeKind, item):
+        if self.recording:
+            key = (kind, item)
+            self._changes[key] = self._changes.get(key, 0) + 1
+
+    def remove(self, kind: ChangeKind, item):
+        if self.recording:
+            key = (kind, item)
+            self._changes[key] = self._changes.get(key, 0) - 1
+
+    def drain(self) -> list:
+        """Returns the Changes recorded since the last call, removals first, and forgets them."""
+        changes = [Change(kind, item, change > 0)
+                   for (kind, item), change in self._changes.items() if change]
+        self._changes = {}
+        changes.sort(key=lambda change: change.added)
+        return changes
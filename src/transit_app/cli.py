@@ -0,0 +1,158 @@
+"""Command line interface for routing without the UI.
+Loads a network, reads origin and destination pairs one at a time
+and writes the shortest path of each pair as a CSV row or a JSON line.
+
+Example: python -m src.transit_app.cli network.tnet --pairs pairs.csv --format jsonl
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import sys
+from itertools import chain
+
+from shapely import Point
+
+from .algorithms import ROUTING_ALGORITHMS
+from .constants import CALCULATION_P_DISTANCE
+from .instrumentation import metrics
+from .loader import iter_csv_segments, load_network
+from .network import Network
+from .snapshot import load_snapshot
+
+CSV_COLUMNS = ["index", "x1", "y1", "x2", "y2", "distance", "path", "error"]
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Finds shortest paths between origin and destination pairs.")
+    parser.add_argument("network",
+                        help="network snapshot (.tnet), or a .geojson, .json or .csv file of roads")
+    parser.add_argument("--pairs", default="-",
+                        help="CSV rows of x1,y1,x2,y2, or JSON lines with \"origin\" and "
+                             "\"destination\" coordinates. Read from stdin by default")
+    parser.add_argument("--output", default="-", help="output file, stdout by default")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv",
+                        help="output format, csv by default")
+    parser.add_argument("--algorithm", choices=[*ROUTING_ALGORITHMS, "ch"], default="dijkstra",
+                        help="routing algorithm, dijkstra by default")
+    parser.add_argument("--snap-distance", type=float, default=CALCULATION_P_DISTANCE,
+                        help="how far from a road an origin or destination can be")
+    parser.add_argument("--paths", action="store_true",
+                        help="also write the points that each path goes through")
+    parser.add_argument("--metrics",
+                        help="collect timers and counters, and write them to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def read_network(path: str) -> Network:
+    """Loads a network snapshot, or builds the network from a file of roads."""
+    if path.lower().endswith(".tnet"):
+        return load_snapshot(path)
+    output = load_network(
+        path, progress=lambda output: print(output, file=sys.stderr))
+    if output.error:
+        raise ValueError(output.error)
+    return output.network
+
+
+def iter_pairs(file):
+    """Yields ((x1, y1), (x2, y2)) origin and destination pairs from <file>.
+    If the first line starts with "{", every line is a JSON object with "origin" and "destination",
+    otherwise the lines are CSV rows like the ones iter_csv_segments() reads."""
+    lines = iter(file)
+    first_line = next(lines, "")
+    lines = chain([first_line], lines)
+    if not first_line.lstrip().startswith("{"):
+        yield from iter_csv_segments(lines)
+        return
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            pair = json.loads(line)
+            (x1, y1), (x2, y2) = pair["origin"], pair["destination"]
+            yield (float(x1), float(y1)), (float(x2), float(y2))
+        except (ValueError, KeyError, TypeError) as error:
+            raise ValueError(f"Invalid pair on line {line_number}") from error
+
+
+def route(network: Network, origin: tuple, destination: tuple, algorithm: str = "dijkstra",
+          snap_distance: float = CALCULATION_P_DISTANCE) -> dict:
+    """Returns the distance and path between two coordinates, which are first moved to the nearest road,
+    or an error if a point is not near any road or the points are not connected."""
+    result = {"distance": None, "path": None, "error": ""}
+    points = []
+    for coords in (origin, destination):
+        snapped = network.snap_to_road(Point(coords), snap_distance)
+        if not snapped:
+            result["error"] = f"{coords} is not near any road"
+            return result
+        points.append(snapped[0])
+    output = network.find_shortest_path(*points, algorithm=algorithm)
+    if output.error:
+        result["error"] = output.error
+    else:
+        result["distance"] = output.end_distance
+        result["path"] = [list(point) for point in output.points]
+    return result
+
+
+def write_results(pairs, network: Network, file, output_format: str = "csv",
+                  algorithm: str = "dijkstra", snap_distance: float = CALCULATION_P_DISTANCE,
+                  paths: bool = False) -> int:
+    """Routes every pair in <pairs> and writes the results to <file> as soon as they are ready.
+    Returns the amount of pairs."""
+    writer = None
+    if output_format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS if paths else
+                        [column for column in CSV_COLUMNS if column != "path"])
+    amount = 0
+    for index, (origin, destination) in enumerate(pairs):
+        result = route(network, origin, destination, algorithm, snap_distance)
+        if writer:
+            row = [index, *origin, *destination, result["distance"]]
+            if paths:
+                row.append(";".join(f"{x} {y}" for x, y in result["path"] or []))
+            writer.writerow(row + [result["error"]])
+        else:
+            line = {"index": index, "origin": list(origin), "destination": list(destination),
+                    "distance": result["distance"]}
+            if paths:
+                line["path"] = result["path"]
+            line["error"] = result["error"]
+            file.write(json.dumps(line) + "\n")
+        amount += 1
+    return amount
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    try:
+        network = read_network(args.network)
+    except (OSError, ValueError) as error:
+        print(f"Could not load the network: {error}", file=sys.stderr)
+        return 1
+
+    with contextlib.ExitStack() as stack:
+        pairs_file = sys.stdin if args.pairs == "-" else \
+            stack.enter_context(open(args.pairs, newline="", encoding="utf-8"))
+        output_file = sys.stdout if args.output == "-" else \
+            stack.enter_context(open(args.output, "w", newline="", encoding="utf-8"))
+        try:
+            write_results(iter_pairs(pairs_file), network, output_file, args.format,
+                          args.algorithm, args.snap_distance, args.paths)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 1
+    if args.metrics:
+        metrics.export(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@ NORMAL_P_COLOR = "b"
 SELECTED_P_COLOR = "r"
 INTERSECTION_P_COLOR = "g"
 CALCULATION_P_COLOR = "c"
+POINT_SIZE = 36  # area of the point markers in points^2
+HITBOX_COLOR = (0.5, 0.5, 0.5, 1)
 
 ROAD_WIDTH = 4
 ROAD_COLOR = (0.6, 0.9, 0.65, 1)
@@ -21,10 +23,36 @@ MIN_DISTANCE_BETWEEN_POINT_AND_ROAD = 0.2
 # 0.1 throws an error when both calculation points are placed on a road ending point, not sure why
 MIN_DISTANCE_BETWEEN_C_POINTS = 0.2
 
+# crossings that are this close to a point are at that point, they only differ by rounding errors
+CROSSING_TOLERANCE = 1e-9
+# how far from a segment given to add_roads_bulk() its checks can reach: the ending points of it and
+# of other segments can move into the hitbox of a nearby point, and the farthest check is for points
+BULK_NEIGHBOR_DISTANCE = MIN_DISTANCE_WHEN_PLACING_POINT + 2 * HITBOX_SIZE * 2 ** 0.5
+
+# how many shortest path results are kept in the cache
+SHORTEST_PATH_CACHE_SIZE = 128
+# offsets of calculation points along a road are rounded to this many decimals in cache keys
+CACHE_OFFSET_DECIMALS = 9
+
+# how many segments the loader adds to the network at once
+LOAD_CHUNK_SIZE = 10000
+# how many characters the loader reads from a GeoJSON file at once
+LOAD_READ_SIZE = 65536
+
 DEFAULT_XLIM = (0, 10)
 DEFAULT_YLIM = (0, 10)
 # how much to zoom in/out
 ZOOM_AMOUNT = 1
+# roads and points this far outside the visible area (as a fraction of its size) are plotted too,
+# so that panning a little does not need to replot them
+VIEW_MARGIN = 0.5
+# when zoomed out so far that hitboxes would be smaller than this many pixels, the map is simplified:
+# points and hitboxes are not shown, and roads that continue each other in a straight line are joined
+LOD_HITBOX_PIXELS = 4
+# how many pixels away from a road or point the mouse can be to show its label
+HOVER_DISTANCE_PIXELS = 5
+# how many milliseconds the mouse has to stay still before the label is updated
+HOVER_DELAY_MS = 50
 
 HOW_TO_USE_TEXT = """
 Start drawing a road by clicking anywhere on the map, then click somewhere else to finish the road. Note that you can not start or end a road right next to an existing one. \n
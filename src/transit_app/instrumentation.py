@@ -0,0 +1,116 @@
+"""Named timers and counters for measuring what the network and the algorithms do.
+Disabled by default. While disabled, timer() returns a shared context manager that does nothing
+and count() returns immediately, and code in loops checks metrics.enabled before counting anything.
+Set the environment variable TRANSIT_APP_METRICS=1, or call metrics.enable(), to collect them.
+
+Example:
+    metrics.enable()
+    network.find_shortest_path(point1, point2)
+    print(metrics.report())
+"""
+
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+_DISABLED_TIMER = nullcontext()
+
+
+class _Timer:
+    """Adds the time spent inside a with block to a named timer."""
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.timers = {}  # name: [calls, total seconds, longest call in seconds]
+        self.counters = {}  # name: value
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    @contextmanager
+    def collecting(self, enabled: bool = True):
+        """Context manager that starts from empty timers and counters, enabled if <enabled> is True.
+        The previous timers, counters and enabled state are restored when the with block ends."""
+        saved = self.enabled, self.timers, self.counters
+        self.enabled = enabled
+        self.reset()
+        try:
+            yield self
+        finally:
+            self.enabled, self.timers, self.counters = saved
+
+    def timer(self, name: str):
+        """Returns a context manager that times its with block as <name>."""
+        if not self.enabled:
+            return _DISABLED_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self) -> dict:
+        """Returns the timers and counters collected so far as a dict that can be saved as JSON."""
+        return {
+            "timers": {name: {"calls": calls, "total_seconds": total, "max_seconds": longest}
+                       for name, (calls, total, longest) in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def export(self, path: str):
+        """Writes report() to <path> as JSON."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+
+# Used by every module of the package
+metrics = Metrics(enabled=os.environ.get("TRANSIT_APP_METRICS", "") not in ("", "0"))
+
+
+def timed(name: str):
+    """Decorator that times every call of a function as <name> while metrics are enabled.
+    Meant for whole operations, not for functions called in loops."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            with _Timer(metrics, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
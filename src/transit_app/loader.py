@@ -0,0 +1,189 @@
+"""Loads road networks from GeoJSON and CSV files.
+Files are read in small pieces and roads are added to the network in chunks,
+so the whole file is never in memory at once."""
+
+import csv
+import json
+import time
+from itertools import islice
+
+from .constants import LOAD_CHUNK_SIZE, LOAD_READ_SIZE
+from .network import Network
+from .utilities import LoadNetworkOutput
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _JSONStream:
+    """Reads a JSON document piece by piece. Values are decoded from the start of the buffer,
+    and the buffer is only filled as far as the value currently being decoded needs."""
+
+    def __init__(self, file, read_size: int) -> None:
+        self.file = file
+        self.read_size = read_size
+        self.buffer = ""
+        self.position = 0
+        self.end_of_file = False
+
+    def _read_more(self) -> bool:
+        if self.end_of_file:
+            return False
+        text = self.file.read(self.read_size)
+        if not text:
+            self.end_of_file = True
+            return False
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return True
+
+    def next_char(self) -> str:
+        """Skips whitespace and returns the next character without consuming it,
+        or "" at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read_more():
+                return ""
+
+    def expect(self, char: str):
+        if self.next_char() != char:
+            raise ValueError(f"Invalid GeoJSON, expected '{char}'")
+        self.position += 1
+
+    def value(self):
+        """Decodes the next JSON value."""
+        self.next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                if not self._read_more():
+                    raise ValueError(f"Invalid GeoJSON: {error.msg}") from error
+                continue
+            if end == len(self.buffer) and not self.end_of_file and \
+                    not isinstance(value, (dict, list, str)):
+                # a number at the end of the buffer might continue in the next piece
+                if self._read_more():
+                    continue
+            self.position = end
+            return value
+
+
+def iter_geojson_segments(file, read_size: int = LOAD_READ_SIZE):
+    """Yields ((x1, y1), (x2, y2)) segments of every LineString and MultiLineString
+    in a GeoJSON FeatureCollection. Other geometries are skipped.
+    Each feature is decoded separately, so only one feature is in memory at a time."""
+    stream = _JSONStream(file, read_size)
+    stream.expect("{")
+    while stream.next_char() != "}":
+        key = stream.value()
+        stream.expect(":")
+        if key != "features":
+            stream.value()
+        else:
+            stream.expect("[")
+            while stream.next_char() != "]":
+                yield from _feature_segments(stream.value())
+                if stream.next_char() == ",":
+                    stream.position += 1
+            stream.expect("]")
+        if stream.next_char() == ",":
+            stream.position += 1
+        elif stream.next_char() == "":
+            raise ValueError("Invalid GeoJSON, file ended too early")
+
+
+def _feature_segments(feature: dict):
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") == "LineString":
+        lines = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiLineString":
+        lines = geometry["coordinates"]
+    else:
+        return
+    for line in lines:
+        for start, end in zip(line, line[1:]):
+            yield (start[0], start[1]), (end[0], end[1])
+
+
+def iter_csv_segments(file):
+    """Yields ((x1, y1), (x2, y2)) segments from CSV rows of x1,y1,x2,y2.
+    If the first row is a header, the columns are found by these names."""
+    columns = (0, 1, 2, 3)
+    for row_number, row in enumerate(csv.reader(file)):
+        if not row:
+            continue
+        if row_number == 0 and not _is_number(row[0]):
+            header = [name.strip().lower() for name in row]
+            try:
+                columns = tuple(header.index(name) for name in ("x1", "y1", "x2", "y2"))
+            except ValueError as error:
+                raise ValueError("CSV header must have columns x1, y1, x2 and y2") from error
+            continue
+        try:
+            x1, y1, x2, y2 = (float(row[column]) for column in columns)
+        except (ValueError, IndexError) as error:
+            raise ValueError(f"Invalid segment on CSV row {row_number + 1}") from error
+        yield (x1, y1), (x2, y2)
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_file_segments(path: str):
+    """Yields the segments of a .geojson, .json or .csv file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as file:
+            yield from iter_csv_segments(file)
+    elif path.lower().endswith((".geojson", ".json")):
+        with open(path, encoding="utf-8") as file:
+            yield from iter_geojson_segments(file)
+    else:
+        raise ValueError(f"Unknown file type: {path}")
+
+
+def chunks(iterable, size: int):
+    """Yields lists of at most <size> items from <iterable>."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_segments(segments, network: Network = None, chunk_size: int = LOAD_CHUNK_SIZE,
+                  progress=None) -> LoadNetworkOutput:
+    """Adds <segments> to <network> (or a new Network) with add_roads_bulk(), <chunk_size> at a time.
+    <progress> is called with the output so far after every chunk."""
+    if network is None:
+        network = Network()
+    output = LoadNetworkOutput(network=network)
+    start_time = time.perf_counter()
+    try:
+        for chunk in chunks(segments, chunk_size):
+            bulk_output = network.add_roads_bulk(chunk)
+            for index, reason in bulk_output.rejected.items():
+                output.rejected[output.segments + index] = reason
+            output.segments += len(chunk)
+            output.seconds = time.perf_counter() - start_time
+            if progress:
+                progress(output)
+    except (OSError, ValueError) as error:
+        output.error = f"Could not load the network: {error}"
+    output.seconds = time.perf_counter() - start_time
+    return output
+
+
+def load_network(path: str, network: Network = None, chunk_size: int = LOAD_CHUNK_SIZE,
+                 progress=None) -> LoadNetworkOutput:
+    """Loads the roads of a GeoJSON or CSV file into <network>, or into a new Network."""
+    return load_segments(iter_file_segments(path), network, chunk_size, progress)
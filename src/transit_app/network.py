@@ -1,27 +1,58 @@
-import time
+import math
+from dataclasses import replace
 
-from shapely import equals, intersection, snap
-from shapely.geometry import LineString, MultiLineString, Point
+import numpy as np
+from shapely import dwithin, equals, intersection, snap
+from shapely.geometry import LineString, MultiLineString, Point, Polygon
 from shapely.geometry.multipoint import MultiPoint
-from shapely.ops import nearest_points, split
-
-from .algorithms import DFS, Dijkstra
-from .constants import (CALCULATION_P_DISTANCE, MIN_DISTANCE_BETWEEN_C_POINTS,
-                        MIN_DISTANCE_BETWEEN_POINT_AND_ROAD)
+from shapely.ops import nearest_points
+
+from .algorithms import (ROUTING_ALGORITHMS, ContractionHierarchy, CSRGraph,
+                         Dijkstra, DisjointSet, build_path,
+                         find_segment_crossings, segment_intersection)
+from .cache import ShortestPathCache
+from .changes import ChangeKind, ChangeLog
+from .constants import (BULK_NEIGHBOR_DISTANCE, CACHE_OFFSET_DECIMALS,
+                        CALCULATION_P_DISTANCE, CROSSING_TOLERANCE,
+                        MIN_DISTANCE_BETWEEN_C_POINTS,
+                        MIN_DISTANCE_BETWEEN_POINT_AND_ROAD,
+                        MIN_DISTANCE_WHEN_PLACING_POINT,
+                        SHORTEST_PATH_CACHE_SIZE)
+from .instrumentation import metrics, timed
+from .spatial_index import SpatialIndex
+from .stats import NetworkStats
 from .utilities import (AddCalculationPointOutput, AddPointOutput,
-                        AddRoadOutput, CreateCrossroadsOutput,
-                        ShortestPathOutput, create_hitbox, find_and_move_road,
-                        find_road_that_has_point, invalid_point_placement,
-                        point_ends_road, point_near_point, shared_coords)
+                        AddRoadOutput, AddRoadsBulkOutput,
+                        CreateCrossroadsOutput, ShortestPathOutput,
+                        create_hitbox, find_road_that_has_point,
+                        invalid_point_placement, path_points, point_ends_road,
+                        point_in_hitbox, point_near_point, road_end_distances,
+                        shared_coords, split_line)
 
 
 class Network:
 
-    def __init__(self) -> None:
+    def __init__(self, cache_size=SHORTEST_PATH_CACHE_SIZE) -> None:
         self.points = []  # All points except calculation points
         self.crossroads = set()  # All these points are inside self.points too
         self.roads = []  # LineStrings
         self.hitboxes = {}
+        # Spatial indexes that contain the same geometries as self.points and self.roads,
+        # used for every proximity check
+        self.point_index = SpatialIndex()
+        self.road_index = SpatialIndex()
+        # Both directions of every road, kept up to date when roads are added or split.
+        # Nodes are integer IDs, routing_graph.node_id() returns the ID of a road ending point.
+        self.routing_graph = CSRGraph()
+        # Road ending points that are connected by roads are in the same set.
+        # Roads are only removed when they are split, which does not change connectivity.
+        self.components = DisjointSet()
+        # Built by build_contraction_hierarchy(), and removed when roads change
+        self.contraction_hierarchy = None
+        # Increased every time roads change, results of find_shortest_path() from
+        # earlier versions are not used from the cache
+        self.version = 0
+        self.path_cache = ShortestPathCache(cache_size)
 
         # Points that the currently building road is using
         self.temp_points = []
@@ -40,199 +71,378 @@ class Network:
         self.add_road_output = None
         self.create_crossroads_output = None
         self.add_calculation_point_output = None
+        self.add_roads_bulk_output = None
 
+        # Geometries added and removed since the UI last redrew, see record_changes()
+        self.changes = ChangeLog()
+
+        # Kept up to date by _store_road() and _discard_road()
+        self.road_stats = NetworkStats()
         # used for statistics like shortest_road, longest_road etc.
         self.stats = {"longest_road_length": None,
-                      "shortest_road_length": None, "road_amount": 0}
+                      "shortest_road_length": None, "road_amount": 0,
+                      "total_road_length": 0.0, "crossroad_amount": 0,
+                      "component_amount": 0, "degree_histogram": {}}
+
+    def _store_point(self, point: Point, hitbox: Polygon):
+        """Adds <point> and its hitbox to the network and to the point index."""
+        self.points.append(point)
+        self.hitboxes[point] = hitbox
+        self.point_index.insert(point)
+        self.changes.add(ChangeKind.POINT, point)
+
+    def _store_road(self, road: LineString):
+        """Adds <road> to the network, the road index, the routing graph and the connected components.
+        Removes the contraction hierarchy, since it is out of date."""
+        self.roads.append(road)
+        self.road_index.insert(road)
+        self.changes.add(ChangeKind.ROAD, road)
+        start = self.routing_graph.add_node(road.coords[0])
+        end = self.routing_graph.add_node(road.coords[-1])
+        self.routing_graph.add_edge(start, end, road.length)
+        self.routing_graph.add_edge(end, start, road.length)
+        self.routing_graph.compact_if_needed()
+        self.components.union(road.coords[0], road.coords[-1])
+        self.road_stats.add_road(road)
+        self.contraction_hierarchy = None
+        self.version += 1
+
+    def _discard_road(self, road: LineString):
+        """Removes <road> from the network, the road index and the routing graph.
+        Removes the contraction hierarchy, since it is out of date."""
+        self.roads.remove(road)
+        self.road_index.remove(road)
+        self.changes.remove(ChangeKind.ROAD, road)
+        self._remove_graph_edge(self.routing_graph.node_id(road.coords[0]),
+                                self.routing_graph.node_id(road.coords[-1]))
+        self.routing_graph.compact_if_needed()
+        self.road_stats.remove_road(road)
+        self.contraction_hierarchy = None
+        self.version += 1
 
     def update_stats(self):
-        self.stats["longest_road_length"] = max(
-            self.roads, key=lambda road: road.length).length
-        self.stats["shortest_road_length"] = min(
-            self.roads, key=lambda road: road.length).length
-        self.stats["road_amount"] = len(self.roads)
-
-    def find_shortest_path(self, point1: Point, point2: Point):
-        """Finds the shortest path between point1 and point2 along a road. Uses Dijkstra's algorithm.
+        """Updates self.stats from self.road_stats, without going through the roads."""
+        self.stats["longest_road_length"] = self.road_stats.longest_road_length()
+        self.stats["shortest_road_length"] = self.road_stats.shortest_road_length()
+        self.stats["road_amount"] = self.road_stats.road_amount
+        self.stats["total_road_length"] = self.road_stats.total_length
+        self.stats["crossroad_amount"] = len(self.crossroads)
+        self.stats["component_amount"] = self.components.count
+        self.stats["degree_histogram"] = self.road_stats.degree_histogram()
+
+    def record_changes(self):
+        """Starts recording changes to self.changes. Everything already in the network
+        is recorded as added, so that the first drain() returns the whole network."""
+        self.changes.start()
+        for road in self.roads:
+            self.changes.add(ChangeKind.ROAD, road)
+        for point in self.points:
+            self.changes.add(ChangeKind.POINT, point)
+        for point in self.temp_points:
+            self.changes.add(ChangeKind.TEMP_POINT, point)
+        for calculation_point in self.calculation_points.values():
+            self.changes.add(ChangeKind.CALCULATION_POINT, calculation_point[0])
+        if self.highlighted_path:
+            self.changes.add(ChangeKind.HIGHLIGHTED_PATH, self.highlighted_path)
+
+    @timed("network.build_contraction_hierarchy")
+    def build_contraction_hierarchy(self):
+        """Preprocesses the routing graph so that shortest path queries with algorithm="ch" are fast.
+        Adding or splitting roads removes the hierarchy, and it is built again on the next "ch" query."""
+        self.contraction_hierarchy = ContractionHierarchy(
+            self.routing_graph).build()
+        return self.contraction_hierarchy
+
+    @timed("network.find_shortest_path")
+    def find_shortest_path(self, point1: Point, point2: Point, algorithm="dijkstra"):
+        """Finds the shortest path between point1 and point2 along a road. 
+        <algorithm> is a key of algorithms.ROUTING_ALGORITHMS, Dijkstra's algorithm by default,
+        or "ch" to use the contraction hierarchy.
         If a path can be found, returns a ShortestPathOutput object 
         that contains the points that make up the path, 
-        and the distance from start point to end point."""
-
-        if not self.connected(point1, point2):
+        and the distance from start point to end point.
+        Results are cached until roads change."""
+        if algorithm not in ROUTING_ALGORITHMS and algorithm != "ch":
             self.shortest_path_output = ShortestPathOutput(
-                error="Point1 and Point2 are not connected!")
+                error=f"Unknown routing algorithm: {algorithm}")
+            return self.shortest_path_output
+
+        cache_key = self._path_cache_key(point1, point2, algorithm)
+        cached = self.path_cache.get(cache_key, self.version)
+        if cached:
+            metrics.count("network.path_cache_hits")
+            if cached.points:
+                self._highlight_path(cached.points)
+            # a copy, so that the UI sees a new output
+            self.shortest_path_output = replace(cached)
             return self.shortest_path_output
 
-        start_time1 = time.time()
-        d = Dijkstra()
-        used_roads = self.roads.copy()
+        metrics.count("network.path_cache_misses")
+        output = self._find_shortest_path(point1, point2, algorithm)
+        self.path_cache.put(cache_key, self.version, output)
+        return output
+
+    def _highlight_path(self, points: list):
+        """Sets the path that the UI highlights. A path from a point to itself has nothing to show."""
+        self._set_highlighted_path(MultiLineString([points]) if len(points) > 1 else None)
+
+    def _set_highlighted_path(self, path: MultiLineString):
+        if self.highlighted_path:
+            self.changes.remove(ChangeKind.HIGHLIGHTED_PATH, self.highlighted_path)
+        self.highlighted_path = path
+        if path:
+            self.changes.add(ChangeKind.HIGHLIGHTED_PATH, path)
+
+    def _path_cache_key(self, point1: Point, point2: Point, algorithm: str):
+        """Returns the roads that the points are on, the offsets of the points along them
+        and <algorithm>, which identify a shortest path query in the cache."""
+        key = [algorithm]
+        for point in (point1, point2):
+            road = find_road_that_has_point(point, self.road_index)
+            offset = road.project(point) if road else None
+            key += [road, offset if offset is None else round(offset, CACHE_OFFSET_DECIMALS)]
+        return tuple(key)
+
+    def _no_path(self):
+        self.shortest_path_output = ShortestPathOutput(
+            error="Point1 and Point2 are not connected!")
+        return self.shortest_path_output
 
-        start_road = find_road_that_has_point(point1, used_roads)
-        end_road = find_road_that_has_point(point2, used_roads)
+    def _find_shortest_path(self, point1: Point, point2: Point, algorithm: str):
+        if not self.connected(point1, point2):
+            return self._no_path()
+
+        if algorithm == "ch":
+            return self._find_shortest_path_ch(point1, point2)
+
+        with metrics.timer("network.find_shortest_path.add_virtual_nodes"):
+            start_road = find_road_that_has_point(point1, self.road_index)
+            end_road = find_road_that_has_point(point2, self.road_index)
+            start_node, added_edges = self._add_virtual_node(point1, start_road)
+            end_node, end_edges = self._add_virtual_node(point2, end_road)
+            added_edges += end_edges
+            if equals(start_road, end_road) and start_node != end_node:
+                # the points can also be connected directly along the road
+                added_edges += self._add_virtual_edge(start_node, end_node, abs(
+                    start_road.project(point1) - start_road.project(point2)))
+
+        try:
+            with metrics.timer(f"network.find_shortest_path.{algorithm}"):
+                search = ROUTING_ALGORITHMS[algorithm](self.routing_graph)
+                result = search.find_distances(start_node, end_node)
+        finally:
+            self._remove_virtual_edges(added_edges)
+        if result is None:
+            return self._no_path()
+        nodes, end_distance = result
+        points = self._node_positions(nodes)
+        self._highlight_path(points)
+
+        self.shortest_path_output = ShortestPathOutput(
+            points=points, end_distance=end_distance)
+        return self.shortest_path_output
+
+    def _find_shortest_path_ch(self, point1: Point, point2: Point):
+        """Finds the shortest path between two connected points with the contraction hierarchy.
+        The points are not nodes of the hierarchy, so the search starts from both ends of the road 
+        that point1 is on and ends at both ends of the road that point2 is on."""
+        if self.contraction_hierarchy is None:
+            self.build_contraction_hierarchy()
+        start_road = find_road_that_has_point(point1, self.road_index)
+        end_road = find_road_that_has_point(point2, self.road_index)
+        with metrics.timer("network.find_shortest_path.ch"):
+            result = self.contraction_hierarchy.query(
+                self._road_end_nodes(point1, start_road), self._road_end_nodes(point2, end_road))
+        if result is None:
+            return self._no_path()
+        nodes, end_distance = result
+        points = path_points(point1, self._node_positions(nodes), point2)
 
         if equals(start_road, end_road):
-            start_road = find_and_move_road(point1, used_roads)
-            start_road = find_and_move_road(point2, used_roads)
-            road_parts = list(split(start_road, point1).geoms)
-            for part in road_parts.copy():
-                if point2.dwithin(part, 1e-8):
-                    more_parts = list(split(part, point2).geoms)
-                    road_parts.remove(part)
-                    road_parts += more_parts
-            used_roads += road_parts
+            distance_on_road = abs(start_road.project(
+                point1) - start_road.project(point2))
+            if distance_on_road <= end_distance:
+                points = [point1.coords[0], point2.coords[0]]
+                end_distance = distance_on_road
 
-        else:
-            start_road = find_and_move_road(point1, used_roads)
-            end_road = find_and_move_road(point2, used_roads)
-
-            start_road_parts = split(start_road, point1).geoms
-            """
-            print("START ROAD PARTS")
-            for part in start_road_parts:
-                print(part)
-            print("")
-            """
-
-            end_road_parts = split(end_road, point2).geoms
-            """
-            print("END ROAD PARTS")
-            for part in end_road_parts:
-                print(part)
-            print("")
-            """
-
-            used_roads += list(start_road_parts) + list(end_road_parts)
-
-        end_time1 = time.time()
-        print(f"TIME FOR FIND_SHORTEST_PATH 1: {end_time1- start_time1}")
-        start_time2 = time.time()
-
-        for road in used_roads:
-            d.add_node(road.coords[0])
-            d.add_node(road.coords[1])
-            d.add_edge(
-                road.coords[0], road.coords[1], road.length)
-            d.add_edge(
-                road.coords[1], road.coords[0], road.length)
-
-        points, end_distance = d.find_distances(
-            point1.coords[0], point2.coords[0])
-        self.highlighted_path = MultiLineString([points])
-
-        end_time2 = time.time()
+        self._highlight_path(points)
         self.shortest_path_output = ShortestPathOutput(
             points=points, end_distance=end_distance)
-        print(f"TIME FOR FIND_SHORTEST_PATH 2: {end_time2 - start_time2}")
         return self.shortest_path_output
 
+    @timed("network.distance_matrix")
+    def distance_matrix(self, sources: list, targets: list, return_paths=False):
+        """Returns a NumPy array where row i, column j is the shortest distance along roads 
+        from sources[i] to targets[j]. Every point is snapped to a road once, like calculation points. 
+        The distance is infinite if either point is not near a road, or if they are not connected.
+        Runs one search per source, which stops when the ends of every target road are reached.
+        If <return_paths> is True, also returns a list of lists that contain the points of each path, 
+        or None if there is no path."""
+        snapped_sources = [self.snap_to_road(point) for point in sources]
+        snapped_targets = [self.snap_to_road(point) for point in targets]
+        target_ends = [self._road_end_nodes(*snapped) if snapped else {}
+                       for snapped in snapped_targets]
+        target_nodes = set()
+        for ends in target_ends:
+            target_nodes.update(ends)
+        # targets that a source on the same road can reach directly along it
+        targets_by_road = {}
+        target_offsets = {}
+        for j, target in enumerate(snapped_targets):
+            if target:
+                target_point, target_road = target
+                targets_by_road.setdefault(target_road, []).append(j)
+                target_offsets[j] = target_road.project(target_point)
+
+        matrix = np.full((len(sources), len(targets)), np.inf)
+        paths = [[None] * len(targets) for _ in sources]
+        search = Dijkstra(self.routing_graph)
+        for i, source in enumerate(snapped_sources):
+            if not source:
+                continue
+            source_point, source_road = source
+            distances, previous = search.search(
+                self._road_end_nodes(source_point, source_road), target_nodes)
+            for j, target in enumerate(snapped_targets):
+                if not target:
+                    continue
+                best_distance = float("inf")
+                best_node = None
+                for node, distance in target_ends[j].items():
+                    if distances.get(node, float("inf")) + distance < best_distance:
+                        best_distance = distances[node] + distance
+                        best_node = node
+                matrix[i, j] = best_distance
+                if return_paths and best_node is not None:
+                    paths[i][j] = path_points(source_point, self._node_positions(
+                        build_path(previous, best_node)), target[0])
+            source_offset = source_road.project(source_point)
+            for j in targets_by_road.get(source_road, []):
+                distance_on_road = abs(source_offset - target_offsets[j])
+                if distance_on_road <= matrix[i, j]:
+                    matrix[i, j] = distance_on_road
+                    if return_paths:
+                        paths[i][j] = path_points(source_point, [], snapped_targets[j][0])
+
+        if return_paths:
+            return matrix, paths
+        return matrix
+
+    def _road_end_nodes(self, point: Point, road: LineString) -> dict:
+        """Returns {node ID: distance from <point>} pairs for both ends of <road>."""
+        return {self.routing_graph.node_id(road_end): distance
+                for road_end, distance in road_end_distances(point, road).items()}
+
+    def _node_positions(self, nodes: list) -> list:
+        """Returns the (x, y) coordinates of the routing graph nodes in <nodes>."""
+        return [self.routing_graph.position(node) for node in nodes]
+
+    def _add_virtual_node(self, point: Point, road: LineString):
+        """Adds <point>, which must be on <road>, to the routing graph as a temporary node 
+        with an edge to both ends of the road. The road itself is not split or copied.
+        Returns the ID of the node, and the edges that did not exist before, 
+        so they can be removed after the search."""
+        added_edges = []
+        node = self.routing_graph.add_node(point.coords[0])
+        for road_end, distance in self._road_end_nodes(point, road).items():
+            if node != road_end:
+                added_edges += self._add_virtual_edge(node, road_end, distance)
+        return node, added_edges
+
+    def _add_virtual_edge(self, start: int, end: int, length: float):
+        if self.routing_graph.has_edge(start, end):
+            return []
+        self.routing_graph.add_edge(start, end, length, temporary=True)
+        self.routing_graph.add_edge(end, start, length, temporary=True)
+        return [(start, end)]
+
+    def _remove_virtual_edges(self, added_edges: list):
+        """Removes edges returned by _add_virtual_node() from the routing graph,
+        and the nodes that were only used by them."""
+        for start, end in added_edges:
+            self._remove_graph_edge(start, end, temporary=True)
+
+    def _remove_graph_edge(self, start: int, end: int, temporary: bool = False):
+        self.routing_graph.remove_edge(start, end, temporary)
+        self.routing_graph.remove_edge(end, start, temporary)
+        for node in (start, end):
+            if self.routing_graph.degree(node) == 0:
+                self.routing_graph.remove_node(node, temporary)
+
+    @timed("network.connected")
     def connected(self, point1: Point, point2: Point):
         """Returns True if <point1> and <point2> are connected by roads, or False otherwise."""
-        dfs = DFS(self.roads)
-        start_road = None
-        road: LineString
-        for road in self.roads:
-            if point1.dwithin(road, 1e-8):
-                start_road = road
-            other_road: LineString
-            for other_road in self.roads:
-                if not (road is other_road) and \
-                    (road.crosses(other_road) or
-                     shared_coords(road, other_road)):
-                    # could be cleaned up?
-                    if other_road not in dfs.graph[road]:
-                        dfs.add_edge(road, other_road)
+        start_road = find_road_that_has_point(point1, self.road_index)
         if not start_road:
-            print("point 1 is not on any road!")
-            return
-        visited_roads = dfs.search(start_road)
-        for visited_road in visited_roads:
-            if point2.dwithin(visited_road, 1e-8):
-                print(dfs.graph)
-                return True
-        return False
+            metrics.count("network.connected_points_not_on_road")
+            return False
+        end_road = find_road_that_has_point(point2, self.road_index)
+        if not end_road:
+            metrics.count("network.connected_points_not_on_road")
+            return False
+        return self.components.connected(start_road.coords[0], end_road.coords[0])
 
     def split_road(self, road: LineString, split_points: list):
         """Splits road in segments based in the points in <split_points>. 
         These points must be on the road. Deletes the old road and returns new roads."""
-        new_roads = []
         if len(split_points) == 0:
-            print("Empty split points list!")
-            return
-        if len(split_points) == 1:
-            new_road_1 = LineString(
-                [road.coords[0], split_points[0].coords[0]])
-            new_road_2 = LineString(
-                [split_points[0].coords[0], road.coords[1]])
-            new_roads.append(new_road_1)
-            new_roads.append(new_road_2)
-        else:
-            first_road = LineString(
-                [road.coords[0], split_points[0].coords[0]])
-            new_roads.append(first_road)
-
-            for i in range(1, len(split_points)):
-                new_road = LineString(
-                    [split_points[i - 1].coords[0], split_points[i].coords[0]])
-                new_roads.append(new_road)
+            metrics.count("network.empty_splits")
+            return []
+        new_roads = split_line(road, split_points)
 
-            last_road = LineString(
-                [split_points[-1].coords[0], road.coords[1]])
-            new_roads.append(last_road)
-
-        if road in self.roads:
-            self.roads.remove(road)
+        if road in self.road_index:
+            self._discard_road(road)
         else:
             self.temp_roads.remove(road)
         return new_roads
 
+    @timed("network.create_crossroads")
     def create_crossroads(self):
-        """Checks points where two roads intersect and adds crossroads there. 
-        Crossroad splits the existing roads."""
+        """Checks points where the roads in self.temp_roads intersect other roads and adds crossroads there. 
+        Crossroad splits the existing roads.
+        Only roads returned by the road index are checked, and each pair of roads is intersected once."""
         new_crossroads = set()
-        used_roads = self.roads + self.temp_roads
-        updated = {road: [] for road in used_roads}  # road: crossroads pairs
-        for road in used_roads:
-            for other_road in used_roads:
-                if road != other_road and bool(intersection(road, other_road)):
-                    crossroads = intersection(road, other_road)
-                    if not isinstance(crossroads, MultiPoint) and not isinstance(crossroads, Point):
+        updated = {}  # road: crossroads pairs
+        for road, other_road in self._crossing_candidates():
+            crossroads = intersection(road, other_road)
+            if crossroads.is_empty:
+                continue
+            if not isinstance(crossroads, MultiPoint) and not isinstance(crossroads, Point):
+                self.create_crossroads_output = CreateCrossroadsOutput(
+                    error="Something went wrong, newly created crossroads is not a multipoint or a point!")
+                return self.create_crossroads_output
+            if isinstance(crossroads, MultiPoint):
+                crossroads = crossroads.geoms
+            else:
+                crossroads = [crossroads]
+            for crossroad in crossroads:
+                if point_ends_road(crossroad, self.road_index):
+                    continue
+                nearby_points = point_near_point(
+                    crossroad, self.point_index)
+                if nearby_points:
+                    if crossroad not in self.crossroads:
+                        # If crossroad is new and near anything, can't add road
                         self.create_crossroads_output = CreateCrossroadsOutput(
-                            error="Something went wrong, newly created crossroads is not a multipoint or a point!")
+                            error="Can't add road here, newly created crossroads is too near an existing point or crossroad!")
                         return self.create_crossroads_output
-                    if isinstance(crossroads, MultiPoint):
-                        crossroads = crossroads.geoms
-                    else:
-                        crossroads = [crossroads]
-                    for crossroad in crossroads:
-                        if point_ends_road(crossroad, self.roads):
-                            continue
-                        nearby_points = point_near_point(
-                            crossroad, self.points)
-                        if nearby_points:
-                            if crossroad not in self.crossroads:
-                                # If crossroad is new and near anything, can't add road
-                                self.create_crossroads_output = CreateCrossroadsOutput(
-                                    error="Can't add road here, newly created crossroads is too near an existing point or crossroad!")
-                                return self.create_crossroads_output
-                            for nearby_point in nearby_points:
-                                if nearby_point not in self.crossroads:
-                                    # if crossroad is near a non-crossroad point, can't add road
-                                    self.create_crossroads_output = CreateCrossroadsOutput(
-                                        error="Can't add road here, newly created crossroads is too near an existing point!")
-                                    return self.create_crossroads_output
-                        updated[road].append(crossroad)
-                        new_crossroads.add(crossroad)
+                    for nearby_point in nearby_points:
+                        if nearby_point not in self.crossroads:
+                            # if crossroad is near a non-crossroad point, can't add road
+                            self.create_crossroads_output = CreateCrossroadsOutput(
+                                error="Can't add road here, newly created crossroads is too near an existing point!")
+                            return self.create_crossroads_output
+                updated.setdefault(road, []).append(crossroad)
+                updated.setdefault(other_road, []).append(crossroad)
+                new_crossroads.add(crossroad)
 
         new_roads = []
-        for road in updated:
-            if road not in used_roads or len(updated[road]) == 0:
-                continue
-            new_roads += self.split_road(road, updated[road])
+        for road, split_points in updated.items():
+            new_roads += self.split_road(road, split_points)
 
         for crossroad in new_crossroads:
-            self.points.append(crossroad)
+            self._store_point(crossroad, create_hitbox(crossroad))
             self.crossroads.add(crossroad)
-            self.hitboxes[crossroad] = create_hitbox(crossroad)
         for road in new_roads:
             self._add_road(road, check_crossroads=False)
 
@@ -240,61 +450,77 @@ class Network:
             new_crossroads=new_crossroads)
         return self.create_crossroads_output
 
+    def _crossing_candidates(self):
+        """Returns (temp road, other road) pairs whose bounding boxes intersect.
+        Other roads are existing roads from the road index, or temp roads later in self.temp_roads,
+        so every pair is returned only once."""
+        pairs = []
+        for i, road in enumerate(self.temp_roads):
+            for other_road in self.road_index.query(road):
+                pairs.append((road, other_road))
+            for other_road in self.temp_roads[i + 1:]:
+                if road.envelope.intersects(other_road.envelope):
+                    pairs.append((road, other_road))
+        return pairs
+
     def add_calculation_point(self, point: Point):
         """Adds a point that distance is measured from, or to. 
         After adding two points, the next point will remove the previous two.
         """
         if len(self.calculation_points) == 2:
-            self.calculation_points.clear()
+            self._clear_calculation_points()
 
         if (len(self.calculation_points) == 1 and
                 point.dwithin(self.calculation_points[0][0], MIN_DISTANCE_BETWEEN_C_POINTS)):
             self.add_calculation_point_output = AddCalculationPointOutput(
                 error="Can't add calculation point right next to another one!", c_point_added=False)
             return self.add_calculation_point_output
-        road: LineString
-        for road in self.roads:
-            if point.dwithin(road, CALCULATION_P_DISTANCE):
-                nearest_on_road = nearest_points(point, road)[1]
-                point = snap(point, nearest_on_road,
-                             tolerance=CALCULATION_P_DISTANCE)
-
-                # if calculation point is close enough to any road to snap to it
-                if len(self.calculation_points) == 0:
-                    calculation_point = (
-                        point, road.project(point), road)
-                    self.calculation_points[0] = calculation_point
-                    self.highlighted_path = None
-                elif len(self.calculation_points) == 1:
-                    calculation_point = (
-                        point, road.project(point), road)
-                    self.calculation_points[1] = calculation_point
-
-                    """
-                    print(
-                        f"CALCULATION POINT 1: {self.calculation_points[0][0]}")
-                    print(
-                        f"CALCULATION POINT 2: {self.calculation_points[1][0]}")
-
-                    print(
-                        f"Distance between the two points: {abs(self.calculation_points[1][1] - self.calculation_points[0][1])}")
-                    print(
-                        f"Connected: {self.connected(self.calculation_points[0][0], self.calculation_points[1][0])}")
-                    """
-                    self.find_shortest_path(
-                        self.calculation_points[0][0], self.calculation_points[1][0])
-                self.add_calculation_point_output = AddCalculationPointOutput(
-                    c_point_added=True)
-                return self.add_calculation_point_output
+        snapped = self.snap_to_road(point)
+        if snapped:
+            point, road = snapped
+            # if calculation point is close enough to any road to snap to it
+            if len(self.calculation_points) == 0:
+                calculation_point = (
+                    point, road.project(point), road)
+                self.calculation_points[0] = calculation_point
+                self.changes.add(ChangeKind.CALCULATION_POINT, point)
+                self._set_highlighted_path(None)
+            elif len(self.calculation_points) == 1:
+                calculation_point = (
+                    point, road.project(point), road)
+                self.calculation_points[1] = calculation_point
+                self.changes.add(ChangeKind.CALCULATION_POINT, point)
+                self.find_shortest_path(
+                    self.calculation_points[0][0], self.calculation_points[1][0])
+            self.add_calculation_point_output = AddCalculationPointOutput(
+                c_point_added=True)
+            return self.add_calculation_point_output
 
         self.add_calculation_point_output = AddCalculationPointOutput(
             c_point_added=False)
         return self.add_calculation_point_output
 
+    def _clear_calculation_points(self):
+        for calculation_point in self.calculation_points.values():
+            self.changes.remove(ChangeKind.CALCULATION_POINT, calculation_point[0])
+        self.calculation_points.clear()
+
+    def snap_to_road(self, point: Point, distance: float = CALCULATION_P_DISTANCE):
+        """Moves <point> to the nearest point of the nearest road, 
+        if that road is within <distance> of it. Returns the moved point and the road, 
+        or False if no road is near enough."""
+        nearby_roads = self.road_index.query(point, "dwithin", distance)
+        if not nearby_roads:
+            return False
+        road: LineString = min(nearby_roads, key=point.distance)
+        nearest_on_road = nearest_points(point, road)[1]
+        point = snap(point, nearest_on_road, tolerance=distance)
+        return point, road
+
     def check_point_overlap(self, point: Point):
         """Checks if <point> overlaps with an existing points hitbox, 
         and returns the existing point if so."""
-        for other_point in self.points:
+        for other_point in self.point_index.query(create_hitbox(point)):
             hitbox = self.hitboxes[other_point]
             if point.within(hitbox):
                 return other_point
@@ -308,11 +534,14 @@ class Network:
     def clear_temp(self):
         """Clears all temp values and current road points. 
         Used after cancelling a road."""
+        for point in self.temp_points:
+            self.changes.remove(ChangeKind.TEMP_POINT, point)
         self.temp_points.clear()
         self.temp_roads.clear()
         self.temp_hitboxes = {}
         self.current_road_points.clear()
 
+    @timed("network.add_point")
     def add_point(self, point: Point) -> tuple | bool:
         """Checks if a point can be added to the network, and adds it.
 
@@ -323,7 +552,7 @@ class Network:
         overlapping_point: Point = self.check_point_overlap(point)
 
         if not overlapping_point:
-            if invalid_point_placement(point, self.points, self.roads):
+            if invalid_point_placement(point, self.point_index, self.road_index):
                 # if point is near another point or road, new road is cancelled
                 self.add_point_output = AddPointOutput(
                     error="Point is too close to another point or road!")
@@ -331,6 +560,7 @@ class Network:
                 return self.add_point_output
             self.temp_points.append(point)
             self.temp_hitboxes[point] = create_hitbox(point)
+            self.changes.add(ChangeKind.TEMP_POINT, point)
         else:
             # sets an existing point as a point of a new road
             point = overlapping_point
@@ -364,14 +594,15 @@ class Network:
         else:
             new_road = added
 
-        for road in self.roads:
+        for road in self.road_index.query(new_road):
             if equals(road, new_road):
                 self.clear_temp()
                 self.add_road_output = AddRoadOutput(
                     error="Road is equal to another road!")
                 return self.add_road_output
 
-        for point in self.points:
+        for point in self.point_index.query(new_road, "dwithin",
+                                            MIN_DISTANCE_BETWEEN_POINT_AND_ROAD):
             if point.dwithin(new_road, MIN_DISTANCE_BETWEEN_POINT_AND_ROAD) and \
                     not shared_coords(point, new_road):
                 self.clear_temp()
@@ -389,12 +620,206 @@ class Network:
                 return self.add_road_output
 
         for point in self.temp_points:
-            self.points.append(point)
-        for point, hitbox in self.temp_hitboxes.items():
-            self.hitboxes[point] = hitbox
+            self._store_point(point, self.temp_hitboxes[point])
         for road in self.temp_roads:
-            self.roads.append(road)
+            self._store_road(road)
         self.clear_temp()
         self.update_stats()
-        self.add_road_output = AddRoadOutput(road=road, all_roads=self.roads)
+        self.add_road_output = AddRoadOutput(road=new_road, all_roads=self.roads)
         return self.add_road_output
+
+    @timed("network.add_roads_bulk")
+    def add_roads_bulk(self, segments: list) -> AddRoadsBulkOutput:
+        """Adds many roads at once. <segments> are LineStrings or ((x1, y1), (x2, y2)) pairs.
+        Each segment is checked with the same rules as a road drawn with add_point(), in the given order,
+        and segments that break them are left out. Ending points inside the hitbox of an existing
+        point or crossroad use that point, like clicking it would.
+        The points and roads near every segment are found before checking any of them,
+        with one sweep over the segments (find_segment_crossings()) and one search of the point
+        and road indexes, and every road is split only once at the end."""
+        self.clear_temp()
+        rejected = {}
+        coords = []
+        for segment in segments:
+            if isinstance(segment, LineString):
+                segment = segment.coords
+            coords.append(tuple(tuple(coord) for coord in segment))
+        valid = [index for index, segment in enumerate(coords) if len(segment) == 2]
+        earlier_roads = {}
+        for i, j, _ in find_segment_crossings([coords[index] for index in valid],
+                                              BULK_NEIGHBOR_DISTANCE):
+            earlier_roads.setdefault(valid[j], []).append(valid[i])
+        lines = [LineString(coords[index]) for index in valid]
+        nearby_points = dict(zip(valid, self.point_index.query_many(
+            lines, "dwithin", BULK_NEIGHBOR_DISTANCE)))
+        nearby_roads = dict(zip(valid, self.road_index.query_many(
+            lines, "dwithin", BULK_NEIGHBOR_DISTANCE)))
+
+        batch = _BulkBatch()
+        for index, segment in enumerate(coords):
+            if len(segment) != 2:
+                rejected[index] = "Road must have exactly two points!"
+                continue
+            error = self._add_bulk_road(index, segment, nearby_points[index], nearby_roads[index],
+                                        earlier_roads.get(index, []), batch)
+            if error:
+                rejected[index] = error
+
+        for point in batch.points:
+            self._store_point(point, batch.hitboxes[point])
+        for crossroad in batch.crossroads.values():
+            self._store_point(crossroad, batch.hitboxes[crossroad])
+            self.crossroads.add(crossroad)
+        new_roads = []
+        for road, split_points in batch.splits.items():
+            self._discard_road(road)
+            new_roads += split_line(road, split_points)
+        for index, road in batch.roads.items():
+            if index in batch.road_splits:
+                new_roads += split_line(road, batch.road_splits[index])
+            else:
+                new_roads.append(road)
+        for road in new_roads:
+            self._store_road(road)
+        self.update_stats()
+        metrics.count("network.bulk_segments", len(coords))
+        metrics.count("network.bulk_segments_rejected", len(rejected))
+
+        self.add_roads_bulk_output = AddRoadsBulkOutput(
+            roads=new_roads, new_crossroads=list(batch.crossroads.values()), rejected=rejected)
+        return self.add_roads_bulk_output
+
+    def _add_bulk_road(self, index: int, segment: tuple, existing_points: list,
+                       existing_roads: list, earlier_roads: list, batch: "_BulkBatch") -> str:
+        """Checks a segment given to add_roads_bulk() and adds it to <batch> if it is valid,
+        or returns the reason why it is not. The segment is only checked against the points and
+        roads near it: <existing_points> and <existing_roads> of the network, and the roads of
+        the earlier segments <earlier_roads> in <batch> and the points on them."""
+        batch_points = batch.points_near(earlier_roads, LineString(segment), BULK_NEIGHBOR_DISTANCE)
+        batch_roads = [(batch.roads[other_index], other_index) for other_index in earlier_roads
+                       if other_index in batch.roads]
+        points = existing_points + batch_points
+        roads = existing_roads + [other_road for other_road, _ in batch_roads]
+        ends = []
+        new_points = []
+        for coord in segment:
+            point = Point(coord)
+            overlapping_point = (point_in_hitbox(point, existing_points, self.hitboxes) or
+                                 point_in_hitbox(point, batch_points, batch.hitboxes))
+            if not overlapping_point and new_points and point.within(create_hitbox(new_points[0])):
+                overlapping_point = new_points[0]
+            if overlapping_point:
+                point = overlapping_point
+            elif invalid_point_placement(point, points, roads):
+                return "Point is too close to another point or road!"
+            else:
+                new_points.append(point)
+            ends.append(point)
+        if equals(ends[0], ends[1]):
+            return "Start and end point cannot be the same point!"
+        ends_coords = [ends[0].coords[0], ends[1].coords[0]]
+        road = LineString(ends_coords)
+
+        for other_road in roads:
+            if equals(other_road, road):
+                return "Road is equal to another road!"
+        for point in points:
+            if point.dwithin(road, MIN_DISTANCE_BETWEEN_POINT_AND_ROAD) and \
+                    not shared_coords(point, road):
+                return "The road is too close to an existing point!"
+
+        # (crossroad, existing road that is crossed or None, index of crossed segment or None)
+        crossings = []
+        other_roads = [(other_road, None) for other_road in existing_roads] + batch_roads
+        for other_road, other_index in other_roads:
+            crossing = segment_intersection(road.coords, other_road.coords)
+            if crossing is None:
+                continue
+            if isinstance(crossing[0], tuple):
+                return "Road overlaps another road!"
+            # the crossing is computed again for every pair of roads, so it can differ
+            # from the point where the roads meet by a rounding error
+            if any(math.dist(crossing, coord) <= CROSSING_TOLERANCE
+                   for coord in [*ends_coords, *other_road.coords]):
+                continue  # the roads are already connected here
+            crossing_point = Point(crossing)
+            batch_crossroad = batch.crossroad_near(crossing_point, batch_points)
+            crossroad = batch_crossroad or crossing_point
+            # like in create_crossroads(), new ending points of the road are not checked
+            nearby_points = [point for point, near in zip(
+                points, dwithin(points, crossroad, MIN_DISTANCE_WHEN_PLACING_POINT))
+                if near and point is not crossroad and point not in new_points]
+            if nearby_points:
+                if crossroad is not batch_crossroad:
+                    return "Newly created crossroads is too near an existing point or crossroad!"
+                for point in nearby_points:
+                    if point not in self.crossroads and point.coords[0] not in batch.crossroads:
+                        return "Newly created crossroads is too near an existing point!"
+            crossings.append((crossroad, None if other_index is not None else other_road, other_index))
+
+        batch.add_road(index, road, new_points)
+        for crossroad, other_road, other_index in crossings:
+            batch.add_crossroad(crossroad, index, other_road, other_index)
+        return ""
+
+
+class _BulkBatch:
+    """Roads accepted by Network.add_roads_bulk() that are not added to the network yet."""
+
+    def __init__(self) -> None:
+        self.roads = {}  # segment index: LineString
+        self.points = []  # new ending points
+        self.crossroads = {}  # (x, y): new crossroad
+        self.hitboxes = {}  # for new ending points and crossroads
+        self.order = {}  # new ending point or crossroad: how many points were added before it
+        self.road_ends = {}  # segment index: new ending points of the road
+        self.splits = {}  # existing road: crossroads on it
+        self.road_splits = {}  # segment index: crossroads on it
+
+    def points_near(self, indices: list, geometry: LineString, distance: float) -> list:
+        """Returns the new ending points and crossroads of the roads <indices>
+        that are within <distance> of <geometry>, in the order they were added."""
+        points = {}
+        for index in indices:
+            for point in self.road_ends.get(index, []) + self.road_splits.get(index, []):
+                points[point] = None
+        points = sorted(points, key=self.order.get)
+        if not points:
+            return points
+        return [point for point, near in zip(points, dwithin(points, geometry, distance)) if near]
+
+    def crossroad_near(self, point: Point, points: list):
+        """Returns the new crossroad in <points> within CROSSING_TOLERANCE of <point>,
+        or None if there is none."""
+        for other_point in points:
+            if other_point.dwithin(point, CROSSING_TOLERANCE) and \
+                    other_point.coords[0] in self.crossroads:
+                return self.crossroads[other_point.coords[0]]
+        return None
+
+    def _add_point(self, point: Point):
+        self.hitboxes[point] = create_hitbox(point)
+        self.order[point] = len(self.order)
+
+    def add_road(self, index: int, road: LineString, new_points: list):
+        self.roads[index] = road
+        self.road_ends[index] = new_points
+        for point in new_points:
+            self.points.append(point)
+            self._add_point(point)
+
+    def add_crossroad(self, crossroad: Point, index: int, other_road: LineString, other_index: int):
+        """Saves <crossroad> as a split point of road <index>, and of either
+        the existing road <other_road> or the road <other_index>."""
+        if crossroad.coords[0] not in self.crossroads:
+            self.crossroads[crossroad.coords[0]] = crossroad
+            self._add_point(crossroad)
+        if other_road is not None:
+            split_lists = (self.road_splits.setdefault(index, []),
+                           self.splits.setdefault(other_road, []))
+        else:
+            split_lists = (self.road_splits.setdefault(index, []),
+                           self.road_splits.setdefault(other_index, []))
+        for split_points in split_lists:
+            if crossroad not in split_points:
+                split_points.append(crossroad)
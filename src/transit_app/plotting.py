@@ -0,0 +1,92 @@
+"""Matplotlib artists that draw many geometries at once.
+Every layer is a single collection, so a map with thousands of roads still has only a few artists.
+Layers are changed with add() and remove(), and the collection is updated in update()."""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+from matplotlib.collections import LineCollection
+
+
+class _Layer(ABC):
+    """Geometries and their drawing data in parallel lists.
+    Removing swaps the last geometry into the removed one's place, so both add and remove are O(1)."""
+
+    def __init__(self) -> None:
+        self.items = []
+        self.data = []
+        self.labels = []
+        self.positions = {}  # item: index in self.items
+        self.changed = False
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item) -> bool:
+        return item in self.positions
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def add(self, item, data, label: str = ""):
+        if item in self.positions:
+            return
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+        self.data.append(data)
+        self.labels.append(label)
+        self.changed = True
+
+    def remove(self, item) -> bool:
+        """Removes <item>, returns False if it is not in the layer."""
+        index = self.positions.pop(item, None)
+        if index is None:
+            return False
+        last_item, last_data, last_label = self.items.pop(), self.data.pop(), self.labels.pop()
+        if index < len(self.items):
+            self.items[index] = last_item
+            self.data[index] = last_data
+            self.labels[index] = last_label
+            self.positions[last_item] = index
+        self.changed = True
+        return True
+
+    def clear(self):
+        self.items, self.data, self.labels, self.positions = [], [], [], {}
+        self.changed = True
+
+    def label(self, item) -> str:
+        return self.labels[self.positions[item]]
+
+    def update(self):
+        """Gives the current geometries to the collection if they have changed."""
+        if self.changed:
+            self._update_collection()
+            self.changed = False
+
+    @abstractmethod
+    def _update_collection(self):
+        """Gives self.data to the collection."""
+
+
+class LineLayer(_Layer):
+    """Lines drawn with one LineCollection. Data of each line is an (n, 2) array of its coordinates."""
+
+    def __init__(self, ax, **style) -> None:
+        super().__init__()
+        self.collection = LineCollection([], **style)
+        ax.add_collection(self.collection, autolim=False)
+
+    def _update_collection(self):
+        self.collection.set_segments(self.data)
+
+
+class PointLayer(_Layer):
+    """Points drawn with one scatter plot. Data of each point is its (x, y) coordinates."""
+
+    def __init__(self, ax, **style) -> None:
+        super().__init__()
+        self.collection = ax.scatter(np.empty(0), np.empty(0), **style)
+
+    def _update_collection(self):
+        self.collection.set_offsets(np.array(self.data, dtype=float).reshape(-1, 2))
@@ -0,0 +1,131 @@
+"""Saves a Network to a binary file and loads it back.
+The file has a header and flat arrays of coordinates and routing graph edges.
+Loading maps the file to memory with numpy.memmap, so the routing graph uses the pages
+of the file directly and processes that load the same file share them."""
+
+import struct
+
+import numpy as np
+import shapely
+
+from .algorithms import CSRGraph, DisjointSet
+from .constants import HITBOX_SIZE
+from .network import Network
+from .spatial_index import SpatialIndex
+from .stats import NetworkStats
+
+MAGIC = b"TRANSNET"
+VERSION = 1
+# magic, version, point amount, road amount, node amount, edge amount
+HEADER = struct.Struct("<8sIxxxxqqqq")
+
+# name, numpy type, memoryview format, values per item; arrays are in this order after the header.
+# Nodes are the ending points of roads in the routing graph.
+ARRAYS = (
+    ("points", "<f8", "d", 2),
+    ("crossroads", "u1", "B", 1),  # 1 if the point is a crossroad
+    ("roads", "<f8", "d", 4),
+    ("positions", "<f8", "d", 2),  # node coordinates
+    ("offsets", "<i8", "q", 1),  # amount is node amount + 1
+    ("targets", "<i8", "q", 1),  # amount is edge amount
+    ("weights", "<f8", "d", 1),
+    ("components", "<i8", "q", 1),  # node ID of the representative node of each node's component
+)
+
+
+def _array_lengths(point_amount: int, road_amount: int, node_amount: int, edge_amount: int) -> dict:
+    return {"points": point_amount, "crossroads": point_amount, "roads": road_amount,
+            "positions": node_amount, "offsets": node_amount + 1, "targets": edge_amount,
+            "weights": edge_amount, "components": node_amount}
+
+
+def _padding(size: int) -> int:
+    """Arrays start at multiples of 8 bytes, so they can be read without copying."""
+    return -size % 8
+
+
+def save_snapshot(network: Network, path: str):
+    """Writes the points, crossroads, roads and routing graph of <network> to <path>.
+    A compacted copy of the routing graph is saved, <network> is not changed."""
+    graph = network.routing_graph.compacted()
+    node_positions = list(zip(graph.positions[0::2], graph.positions[1::2]))
+    representatives = {}  # component root: first node ID in the component
+    components = [representatives.setdefault(network.components.find(position), node_id)
+                  for node_id, position in enumerate(node_positions)]
+    arrays = {
+        "points": np.array([point.coords[0] for point in network.points], dtype="<f8"),
+        "crossroads": np.array([point in network.crossroads for point in network.points],
+                               dtype="u1"),
+        "roads": np.array([road.coords[0] + road.coords[-1] for road in network.roads],
+                          dtype="<f8"),
+        "positions": np.array(graph.positions, dtype="<f8"),
+        "offsets": np.array(graph.offsets, dtype="<i8"),
+        "targets": np.array(graph.targets, dtype="<i8"),
+        "weights": np.array(graph.weights, dtype="<f8"),
+        "components": np.array(components, dtype="<i8"),
+    }
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(network.points), len(network.roads),
+                               len(node_positions), len(graph.targets)))
+        size = HEADER.size
+        for name, _, _, _ in ARRAYS:
+            file.write(b"\0" * _padding(size))
+            size += _padding(size)
+            data = arrays[name].tobytes()
+            file.write(data)
+            size += len(data)
+
+
+def _read_arrays(path: str) -> dict:
+    """Returns {name: memoryview} for every array in the file, using the memory-mapped file."""
+    data = np.memmap(path, dtype="u1", mode="r")
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a network snapshot")
+    magic, version, *amounts = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a network snapshot")
+    if version != VERSION:
+        raise ValueError(f"{path} is snapshot version {version}, only version {VERSION} can be loaded")
+    lengths = _array_lengths(*amounts)
+    view = memoryview(data)
+    arrays = {}
+    position = HEADER.size
+    for name, dtype, view_format, width in ARRAYS:
+        position += _padding(position)
+        size = lengths[name] * width * np.dtype(dtype).itemsize
+        if position + size > len(data):
+            raise ValueError(f"{path} is not a complete network snapshot")
+        arrays[name] = view[position:position + size].cast(view_format)
+        position += size
+    return arrays
+
+
+def load_snapshot(path: str) -> Network:
+    """Returns a Network with the points, crossroads, roads and routing graph saved in <path>.
+    Geometries and spatial indexes are created with vectorized shapely functions,
+    and the routing graph uses the memory-mapped arrays directly."""
+    arrays = _read_arrays(path)
+    network = Network()
+
+    point_coords = np.frombuffer(arrays["points"], dtype="<f8").reshape(-1, 2)
+    points = shapely.points(point_coords)
+    hitboxes = shapely.box(point_coords[:, 0] - HITBOX_SIZE, point_coords[:, 1] - HITBOX_SIZE,
+                           point_coords[:, 0] + HITBOX_SIZE, point_coords[:, 1] + HITBOX_SIZE)
+    network.points = points.tolist()
+    network.hitboxes = dict(zip(network.points, hitboxes.tolist()))
+    is_crossroad = np.frombuffer(arrays["crossroads"], dtype="u1").astype(bool)
+    network.crossroads = set(points[is_crossroad].tolist())
+    road_coords = np.frombuffer(arrays["roads"], dtype="<f8").reshape(-1, 2, 2)
+    network.roads = shapely.linestrings(road_coords).tolist()
+    network.point_index = SpatialIndex(network.points)
+    network.road_index = SpatialIndex(network.roads)
+
+    network.routing_graph = CSRGraph.from_arrays(
+        arrays["positions"], arrays["offsets"], arrays["targets"], arrays["weights"])
+    node_positions = list(network.routing_graph.node_ids)
+    network.components = DisjointSet.from_roots(
+        node_positions, [node_positions[root] for root in arrays["components"]])
+    network.road_stats = NetworkStats.from_roads(
+        network.roads, shapely.length(network.roads).tolist())
+    network.update_stats()
+    return network
@@ -0,0 +1,148 @@
+from shapely import STRtree
+from shapely.geometry.base import BaseGeometry
+
+# Smallest amount of unindexed geometries that triggers a rebuild of the tree
+MIN_REBUILD_SIZE = 32
+
+
+class SpatialIndex:
+    """A set of geometries that can be searched by location.
+    Most geometries are kept in a shapely STRtree, which cannot be changed after it has been built.
+    Newly inserted geometries go to a small buffer that is searched linearly,
+    and removed geometries are only marked as removed.
+    The tree is rebuilt when the buffer or the amount of removed geometries grows too large,
+    so inserts stay cheap and queries stay close to O(log n)."""
+
+    def __init__(self, geometries: list = None) -> None:
+        self._tree = None
+        self._tree_geometries = []
+        self._removed = set()  # indices of removed geometries in self._tree_geometries
+        self._buffer = {}  # geometry: its bounds, in insertion order
+        # geometry: insertion number, used to return results in insertion order
+        self._order = {}
+        self._counter = 0
+        if geometries:
+            for geometry in geometries:
+                self._order[geometry] = self._counter
+                self._counter += 1
+            self._rebuild(list(self._order.keys()))
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, geometry: BaseGeometry) -> bool:
+        return geometry in self._order
+
+    def __iter__(self):
+        return iter(sorted(self._order, key=self._order.get))
+
+    def insert(self, geometry: BaseGeometry):
+        """Adds <geometry> to the index. Does nothing if it is already there."""
+        if geometry in self._order:
+            return
+        self._order[geometry] = self._counter
+        self._counter += 1
+        self._buffer[geometry] = geometry.bounds
+        if len(self._buffer) > max(MIN_REBUILD_SIZE, len(self._tree_geometries) ** 0.5):
+            self._rebuild(list(self._order.keys()))
+
+    def remove(self, geometry: BaseGeometry):
+        """Removes <geometry> from the index. Does nothing if it is not there."""
+        if geometry not in self._order:
+            return
+        del self._order[geometry]
+        if geometry in self._buffer:
+            del self._buffer[geometry]
+            return
+        for index in self._tree_indices(geometry):
+            if self._tree_geometries[index] == geometry:
+                self._removed.add(index)
+                break
+        if len(self._removed) > max(MIN_REBUILD_SIZE, len(self._tree_geometries) // 2):
+            self._rebuild(list(self._order.keys()))
+
+    def clear(self):
+        self._tree = None
+        self._tree_geometries = []
+        self._removed = set()
+        self._buffer = {}
+        self._order = {}
+
+    def query(self, geometry: BaseGeometry, predicate: str = None, distance: float = None) -> list:
+        """Returns the indexed geometries that satisfy <predicate> with <geometry>,
+        in the order they were inserted. Predicates are the same as in shapely.STRtree.query(),
+        for example "intersects" or "dwithin" (which needs <distance>).
+        Without a predicate, returns every geometry whose bounding box intersects
+        the bounding box of <geometry>."""
+        found = []
+        if self._tree is not None:
+            if predicate == "dwithin":
+                indices = self._tree.query(
+                    geometry, predicate=predicate, distance=distance)
+            else:
+                indices = self._tree.query(geometry, predicate=predicate)
+            for index in indices:
+                if index not in self._removed:
+                    found.append(self._tree_geometries[index])
+
+        if self._buffer:
+            found += self._query_buffer(geometry, predicate, distance)
+
+        if len(found) > 1:
+            found.sort(key=self._order.get)
+        return found
+
+    def query_many(self, geometries: list, predicate: str = None, distance: float = None) -> list:
+        """Returns a list that contains what query() returns for each geometry in <geometries>.
+        The tree is searched only once for all of them."""
+        found = [[] for _ in geometries]
+        if self._tree is not None and geometries:
+            if predicate == "dwithin":
+                pairs = self._tree.query(
+                    geometries, predicate=predicate, distance=distance)
+            else:
+                pairs = self._tree.query(geometries, predicate=predicate)
+            for i, index in zip(*pairs.tolist()):
+                if index not in self._removed:
+                    found[i].append(self._tree_geometries[index])
+
+        for i, geometry in enumerate(geometries):
+            if self._buffer:
+                found[i] += self._query_buffer(geometry, predicate, distance)
+            if len(found[i]) > 1:
+                found[i].sort(key=self._order.get)
+        return found
+
+    def _query_buffer(self, geometry: BaseGeometry, predicate: str, distance: float) -> list:
+        bounds = geometry.bounds
+        if predicate == "dwithin":
+            bounds = (bounds[0] - distance, bounds[1] - distance,
+                      bounds[2] + distance, bounds[3] + distance)
+        return [other for other, other_bounds in self._buffer.items()
+                if _boxes_intersect(bounds, other_bounds) and
+                _matches(geometry, other, predicate, distance)]
+
+    def _tree_indices(self, geometry: BaseGeometry):
+        if self._tree is None:
+            return []
+        return self._tree.query(geometry)
+
+    def _rebuild(self, geometries: list):
+        self._tree_geometries = geometries
+        self._tree = STRtree(geometries) if geometries else None
+        self._removed = set()
+        self._buffer = {}
+
+
+def _boxes_intersect(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _matches(geometry: BaseGeometry, other: BaseGeometry, predicate: str, distance: float):
+    """Checks <predicate> between <geometry> and <other> the same way STRtree.query() does,
+    for geometries whose bounding boxes intersect."""
+    if predicate is None:
+        return True
+    if predicate == "dwithin":
+        return geometry.dwithin(other, distance)
+    return getattr(geometry, predicate)(other)
@@ -0,0 +1,96 @@
+import heapq
+import math
+from collections import Counter
+
+from shapely import LineString
+
+
+class NetworkStats:
+    """Road statistics that are kept up to date as roads are added and removed,
+    so they never need a pass over every road.
+    The shortest and longest lengths are kept in heaps. Removed lengths stay in the heaps
+    until they reach the top, and the heaps are rebuilt when most of their entries are removed."""
+
+    def __init__(self) -> None:
+        self.road_amount = 0
+        self.total_length = 0.0
+        self._lengths = Counter()  # length: amount of roads with that length
+        self._shortest = []  # min-heap of lengths
+        self._longest = []  # min-heap of negated lengths
+        self.degrees = {}  # road ending point: amount of roads that end there
+        self._degree_histogram = Counter()  # degree: amount of points with that degree
+
+    @classmethod
+    def from_roads(cls, roads: list, lengths: list = None):
+        """Returns stats of <roads>. <lengths> can be given if they are already known."""
+        road_stats = cls()
+        if lengths is None:
+            lengths = [road.length for road in roads]
+        road_stats.road_amount = len(roads)
+        road_stats.total_length = math.fsum(lengths)
+        road_stats._lengths = Counter(lengths)
+        road_stats._shortest = list(road_stats._lengths)
+        heapq.heapify(road_stats._shortest)
+        road_stats._longest = [-length for length in road_stats._lengths]
+        heapq.heapify(road_stats._longest)
+        road_stats.degrees = Counter(end for road in roads
+                                     for end in (road.coords[0], road.coords[-1]))
+        road_stats._degree_histogram = Counter(road_stats.degrees.values())
+        return road_stats
+
+    def add_road(self, road: LineString):
+        length = road.length
+        self.road_amount += 1
+        self.total_length += length
+        self._lengths[length] += 1
+        if self._lengths[length] == 1:
+            heapq.heappush(self._shortest, length)
+            heapq.heappush(self._longest, -length)
+        for end in (road.coords[0], road.coords[-1]):
+            self._change_degree(end, 1)
+
+    def remove_road(self, road: LineString):
+        length = road.length
+        self.road_amount -= 1
+        self.total_length -= length
+        self._lengths[length] -= 1
+        if self._lengths[length] == 0:
+            del self._lengths[length]
+            if len(self._shortest) > 2 * len(self._lengths) + 32:
+                self._shortest = list(self._lengths)
+                heapq.heapify(self._shortest)
+                self._longest = [-length for length in self._lengths]
+                heapq.heapify(self._longest)
+        for end in (road.coords[0], road.coords[-1]):
+            self._change_degree(end, -1)
+        if self.road_amount == 0:
+            self.total_length = 0.0
+
+    def _change_degree(self, point: tuple, change: int):
+        degree = self.degrees.get(point, 0)
+        if degree:
+            self._degree_histogram[degree] -= 1
+            if self._degree_histogram[degree] == 0:
+                del self._degree_histogram[degree]
+        degree += change
+        if degree:
+            self.degrees[point] = degree
+            self._degree_histogram[degree] += 1
+        else:
+            del self.degrees[point]
+
+    def shortest_road_length(self):
+        """Returns the length of the shortest road, or None if there are no roads."""
+        while self._shortest and self._shortest[0] not in self._lengths:
+            heapq.heappop(self._shortest)
+        return self._shortest[0] if self._shortest else None
+
+    def longest_road_length(self):
+        """Returns the length of the longest road, or None if there are no roads."""
+        while self._longest and -self._longest[0] not in self._lengths:
+            heapq.heappop(self._longest)
+        return -self._longest[0] if self._longest else None
+
+    def degree_histogram(self) -> dict:
+        """Returns {degree: amount of road ending points with that many roads}."""
+        return dict(sorted(self._degree_histogram.items()))
@@ -3,18 +3,22 @@ import typing
 from enum import Enum
 
 import matplotlib.patheffects as pe
-import mplcursors
 # Implement the default Matplotlib key bindings.
 from matplotlib.backend_bases import MouseButton
-from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
-                                               NavigationToolbar2Tk)
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-from shapely import get_coordinates
+from shapely import box, get_coordinates
 from shapely.geometry import Point
 
+from .algorithms import merge_collinear_segments
+from .changes import Change, ChangeKind
 from .constants import (CALCULATION_P_COLOR, DEFAULT_XLIM, DEFAULT_YLIM,
-                        HOW_TO_USE_TEXT, HPATH_COLOR, NORMAL_P_COLOR,
-                        ROAD_COLOR, ROAD_WIDTH, SELECTED_P_COLOR, ZOOM_AMOUNT)
+                        HITBOX_COLOR, HITBOX_SIZE, HOVER_DELAY_MS,
+                        HOVER_DISTANCE_PIXELS, HOW_TO_USE_TEXT, HPATH_COLOR,
+                        LOD_HITBOX_PIXELS, NORMAL_P_COLOR, POINT_SIZE,
+                        ROAD_COLOR, ROAD_WIDTH, SELECTED_P_COLOR, VIEW_MARGIN,
+                        ZOOM_AMOUNT)
+from .plotting import LineLayer, PointLayer
 from .utilities import (AddCalculationPointOutput, AddPointOutput,
                         AddRoadOutput, CreateCrossroadsOutput,
                         ShortestPathOutput, create_hitbox)
@@ -23,7 +27,7 @@ if typing.TYPE_CHECKING:
     from .network import Network
 
 
-NO_CURSOR = False  # No yellow boxes
+NO_CURSOR = False  # No yellow labels when hovering
 PRINT_CLICK_INFO = False  # use to print information on each mouse click
 
 
@@ -31,6 +35,7 @@ class PointType(Enum):
     NORMAL = "normal"
     SELECTED = "selected"
     CALCULATION = "calculation"
+    TEMP = "temp"
 
 
 class Counter:
@@ -55,12 +60,43 @@ class UI:
         self.root = tk.Tk()
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
 
-        self.plotted_lines = {}
-        self.plotted_points = {}  # All points except calculation points
-        self.plotted_temp_points = {}  # Points for the currently building road
-        self.plotted_calculation_points = {}
-        self.plotted_hitboxes = {}
+        # One collection for all roads, one for all hitboxes and one for each type of point.
+        # Roads and normal points are the static part of the map. The other layers are animated:
+        # they are drawn on top of a saved image of the static part (blitting),
+        # so changing only them does not render the whole map again.
+        self.plotted_lines = LineLayer(
+            self.ax, linewidths=ROAD_WIDTH, colors=[ROAD_COLOR], zorder=0,
+            path_effects=[pe.Stroke(linewidth=5, foreground='black'), pe.Normal()])
+        self.plotted_hitboxes = LineLayer(
+            self.ax, linewidths=1, colors=[HITBOX_COLOR], zorder=1, animated=True)
+        self.plotted_points = {
+            point_type: PointLayer(self.ax, s=POINT_SIZE, c=color, zorder=2,
+                                   animated=point_type != PointType.NORMAL)
+            for point_type, color in [(PointType.NORMAL, NORMAL_P_COLOR),
+                                      (PointType.TEMP, NORMAL_P_COLOR),
+                                      (PointType.SELECTED, SELECTED_P_COLOR),
+                                      (PointType.CALCULATION, CALCULATION_P_COLOR)]}
         self.plotted_highlighted_path = None
+        self.plotted_hitboxes_shown = False
+        self.selected_point = None
+        self.road_numbers = {}  # road: number in its label
+
+        # Only roads and points inside this (min x, min y, max x, max y) area are plotted,
+        # it is the visible area and VIEW_MARGIN around it
+        self.view_window = None
+        self.simplified = False  # see LOD_HITBOX_PIXELS
+        self.view_outdated = False  # roads have changed while simplified
+        # Image of the static part of the map, saved after every full draw
+        self.background = None
+        self.background_limits = None
+
+        # Label of the road or point under the mouse, also animated
+        self.hover_annotation = self.ax.annotate(
+            "", xy=(0, 0), xytext=(10, 10), textcoords="offset points",
+            bbox={"boxstyle": "round", "fc": "yellow"}, zorder=3, animated=True, visible=False)
+        self.hovered = None  # the geometry whose label is shown
+        self.hover_position = None  # latest mouse position in data coordinates
+        self.hover_job = None  # the pending update_hover() call
 
         self.printed_shortest_path_output: ShortestPathOutput = None
         self.printed_add_point_output: AddPointOutput = None
@@ -73,9 +109,13 @@ class UI:
         self.canvas.mpl_connect('button_press_event', self.onclick)
         self.canvas.mpl_connect('key_press_event', self.onkey)
         self.canvas.mpl_connect('scroll_event', self.zoom)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        if not NO_CURSOR:
+            self.canvas.mpl_connect('motion_notify_event', self.on_hover)
 
         self.add_info_text("Start drawing!", sep=False)
-        self.canvas.draw()
+        self.network.record_changes()
+        self.redraw()
 
     def print_all_roads(self):
         new_text = f"All Roads ({len(self.network.roads)} in total):"
@@ -120,17 +160,53 @@ class UI:
         self.info_text.see(tk.END)
         self.info_text.config(state="disabled")
 
-    def create_cursor(self):
-        """Needs to be recreated every time new data is added?"""
-        def joku(sel):
-            if NO_CURSOR:
-                sel.annotation.set_text("")
-            else:
-                sel.annotation.set_text(sel.artist)
-
-        cursor = mplcursors.cursor(hover=True)
-        cursor.connect(
-            "add", lambda sel: joku(sel))
+    def on_hover(self, event):
+        """Updates the label under the mouse once the mouse has stayed still for HOVER_DELAY_MS."""
+        self.hover_position = None if event.xdata is None or event.ydata is None else \
+            (event.xdata, event.ydata)
+        if self.hover_job is not None:
+            self.root.after_cancel(self.hover_job)
+        self.hover_job = self.root.after(HOVER_DELAY_MS, self.update_hover)
+
+    def update_hover(self):
+        self.hover_job = None
+        hovered = None
+        if self.hover_position:
+            hovered = self.find_hovered(Point(self.hover_position))
+        if hovered is None and self.hovered is None:
+            return
+        if hovered is not None and self.hovered is not None and hovered[0] is self.hovered[0]:
+            return
+        self.hovered = hovered
+        if hovered:
+            self.hover_annotation.xy = self.hover_position
+            self.hover_annotation.set_text(hovered[1])
+        self.hover_annotation.set_visible(hovered is not None)
+        self.refresh()
+
+    def find_hovered(self, position: Point):
+        """Returns the nearest calculation point, point or road within HOVER_DISTANCE_PIXELS
+        of <position> and its label, or None. Points are found before roads."""
+        width = self.ax.get_window_extent().width or 1
+        xlim = self.ax.get_xlim()
+        distance = HOVER_DISTANCE_PIXELS * abs(xlim[1] - xlim[0]) / width
+
+        points = [calculation_point[0] for calculation_point in
+                  self.network.calculation_points.values()]
+        points += self.network.temp_points
+        points = [point for point in points if point.dwithin(position, distance)]
+        if not self.simplified:
+            points += self.network.point_index.query(position, "dwithin", distance)
+        if points:
+            point = min(points, key=position.distance)
+            return point, str(point)
+        roads = self.network.road_index.query(position, "dwithin", distance)
+        if roads:
+            road = min(roads, key=position.distance)
+            if road in self.plotted_lines:
+                return road, self.plotted_lines.label(road)
+            return road, f"Road, length {road.length}"
+        return None
 
     def redraw(self):
         self.longest_road_label.config(
@@ -145,12 +221,12 @@ class UI:
                 self.printed_shortest_path_output = self.network.shortest_path_output
                 self.add_info_text(self.printed_shortest_path_output)
 
+        selected_point = None
         if self.network.add_point_output:
             if self.printed_add_point_output is not self.network.add_point_output:
                 self.printed_add_point_output = self.network.add_point_output
                 if self.printed_add_point_output.point_overlaps:
-                    self.plotted_points[self.printed_add_point_output.point].set_color(
-                        SELECTED_P_COLOR)
+                    selected_point = self.printed_add_point_output.point
                 if self.printed_add_point_output.error:
                     self.add_info_text(self.printed_add_point_output)
 
@@ -172,145 +248,174 @@ class UI:
                     self.add_info_text(
                         self.printed_add_calculation_point_output)
 
-        if self.show_hitboxes.get() == 0:
-            for point in list(self.plotted_points.keys()):
-                self.remove_plotted_hitbox(point)
-
-        if self.show_hitboxes.get() == 1 and len(self.plotted_hitboxes.values()) == 0:
-            for point in list(self.plotted_points.keys()):
-                self.plot_hitbox(point)
-
-        lines = list(self.plotted_lines.keys())
-        for line in lines:
-            if line not in self.network.roads:
-                self.remove_plotted_road(line)
+        # Only what changed since the last redraw is plotted or removed
+        for change in self.network.changes.drain():
+            self.apply_change(change)
+
+        self.update_view()
+
+        if selected_point:
+            self.select_point(selected_point)
+
+        static_changed = self.plotted_lines.changed or self.plotted_points[PointType.NORMAL].changed
+        self.plotted_lines.update()
+        self.plotted_hitboxes.update()
+        for layer in self.plotted_points.values():
+            layer.update()
+
+        self.refresh(static_changed)
+
+    def update_view(self):
+        """Replots the roads and points near the visible area if the view has moved outside of
+        self.view_window, zoomed in a lot, or zoomed past the level where the map is simplified."""
+        (min_x, max_x), (min_y, max_y) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        width, height = max_x - min_x, max_y - min_y
+        pixels = self.ax.get_window_extent().width or 1
+        simplified = 2 * HITBOX_SIZE * pixels / width < LOD_HITBOX_PIXELS
+        show_hitboxes = self.show_hitboxes.get() == 1 and not simplified
+        window = self.view_window
+        if window is not None and not self.view_outdated and simplified == self.simplified and \
+                window[0] <= min_x and window[1] <= min_y and window[2] >= max_x and window[3] >= max_y and \
+                window[2] - window[0] <= 2 * (1 + 2 * VIEW_MARGIN) * width:
+            if show_hitboxes and not self.plotted_hitboxes_shown:
+                for point_type in (PointType.NORMAL, PointType.TEMP):
+                    for point in self.plotted_points[point_type]:
+                        self.plot_hitbox(point)
+            if not show_hitboxes and self.plotted_hitboxes_shown:
+                self.plotted_hitboxes.clear()
+            self.plotted_hitboxes_shown = show_hitboxes
+            return
 
-        lines = list(self.plotted_lines.keys())
-        for road in self.network.roads:
-            if road not in lines:
+        self.view_window = (min_x - VIEW_MARGIN * width, min_y - VIEW_MARGIN * height,
+                            max_x + VIEW_MARGIN * width, max_y + VIEW_MARGIN * height)
+        self.simplified = simplified
+        self.view_outdated = False
+        self.plotted_lines.clear()
+        self.plotted_points[PointType.NORMAL].clear()
+        self.plotted_hitboxes.clear()
+        area = box(*self.view_window)
+        roads = self.network.road_index.query(area)
+        if simplified:
+            for segment in merge_collinear_segments(
+                    [(road.coords[0], road.coords[-1]) for road in roads]):
+                self.plotted_lines.add(segment, segment)
+        else:
+            for road in roads:
                 self.plot_road(road)
-
-        points = list(self.plotted_points.keys())
-        for point in points:
-            if point not in self.network.points:
-                self.remove_plotted_point(point, point_type=PointType.NORMAL)
-                self.remove_plotted_hitbox(point)
-
-        points = list(self.plotted_points.keys())
-        for point in self.network.points:
-            if point not in points:
-                self.plot_point(point, point_type=PointType.NORMAL)
-                if self.show_hitboxes.get() == 1:
-                    self.plot_hitbox(point)
-
-        points = list(self.plotted_temp_points.keys())
-        for point in points:
-            if point not in self.network.temp_points:
-                self.remove_plotted_point(point, point_type=PointType.NORMAL)
-                self.remove_plotted_hitbox(point)
-
-        points = list(self.plotted_temp_points.keys())
-        for point in self.network.temp_points:
-            if point not in points:
-                self.plot_point(point, point_type=PointType.NORMAL)
-                if self.show_hitboxes.get() == 1:
+            for point in self.network.point_index.query(area):
+                self.plot_point(point, PointType.NORMAL)
+        self.plotted_hitboxes_shown = show_hitboxes
+        if show_hitboxes:
+            for point_type in (PointType.NORMAL, PointType.TEMP):
+                for point in self.plotted_points[point_type]:
                     self.plot_hitbox(point)
 
-        if self.network.calculation_points:
-            if len(self.network.calculation_points) == 1:
-                network_calc_points = [self.network.calculation_points[0][0]]
-            elif len(self.network.calculation_points) == 2:
-                network_calc_points = [
-                    self.network.calculation_points[0][0], self.network.calculation_points[1][0]]
-            calculation_points = list(self.plotted_calculation_points.keys())
-            for calculation_point in calculation_points:
-                if calculation_point not in network_calc_points:
-                    self.remove_plotted_point(
-                        calculation_point, point_type=PointType.CALCULATION)
-
-        if self.network.calculation_points:
-            if len(self.network.calculation_points) == 1:
-                network_calc_points = [self.network.calculation_points[0][0]]
-            elif len(self.network.calculation_points) == 2:
-                network_calc_points = [
-                    self.network.calculation_points[0][0], self.network.calculation_points[1][0]]
-            calculation_points = list(self.plotted_calculation_points.keys())
-            for calculation_point in network_calc_points:
-                if calculation_point not in calculation_points:
-                    self.plot_point(
-                        calculation_point, point_type=PointType.CALCULATION)
-
-        if self.plotted_highlighted_path:
-            self.plotted_highlighted_path.remove()
-            self.plotted_highlighted_path = None
-
-        if self.network.highlighted_path:
-            x = [coords[0]
-                 for coords in get_coordinates(self.network.highlighted_path)]
-            y = [coords[1]
-                 for coords in get_coordinates(self.network.highlighted_path)]
-            self.plotted_highlighted_path = self.ax.plot(
-                x, y, linewidth=ROAD_WIDTH, color=HPATH_COLOR, zorder=0)[0]
-
-        self.canvas.draw()
+    def in_view(self, geometry) -> bool:
+        """Returns True if the bounding box of <geometry> intersects self.view_window."""
+        if self.view_window is None:
+            return False
+        min_x, min_y, max_x, max_y = geometry.bounds
+        return min_x <= self.view_window[2] and max_x >= self.view_window[0] and \
+            min_y <= self.view_window[3] and max_y >= self.view_window[1]
+
+    def refresh(self, static_changed: bool = False):
+        """Draws the whole map if its static part has changed or it has been moved,
+        and otherwise only the animated layers."""
+        limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        if static_changed or self.background is None or limits != self.background_limits:
+            self.canvas.draw()  # calls on_draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_animated()
+            self.canvas.blit(self.fig.bbox)
+
+    def on_draw(self, event):
+        """Saves the static part of the map after a full draw, and draws the animated layers on it."""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.background_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        self.draw_animated()
+
+    def draw_animated(self):
+        artists = [self.plotted_highlighted_path, self.plotted_hitboxes.collection,
+                   *[self.plotted_points[point_type].collection for point_type in
+                     (PointType.TEMP, PointType.CALCULATION, PointType.SELECTED)],
+                   self.hover_annotation]
+        for artist in artists:
+            if artist is not None:
+                self.ax.draw_artist(artist)
+
+    def apply_change(self, change: Change):
+        """Plots or removes the geometry of <change>."""
+        match change.kind:
+            case ChangeKind.ROAD:
+                if not change.added:
+                    self.remove_plotted_road(change.item)
+                if self.simplified:
+                    # joined roads are replotted in update_view()
+                    self.view_outdated = True
+                elif change.added and self.in_view(change.item):
+                    self.plot_road(change.item)
+            case ChangeKind.POINT | ChangeKind.TEMP_POINT:
+                point_type = PointType.NORMAL if change.kind == ChangeKind.POINT else PointType.TEMP
+                if change.added:
+                    if point_type == PointType.NORMAL and \
+                            (self.simplified or not self.in_view(change.item)):
+                        return
+                    self.plot_point(change.item, point_type)
+                    if self.plotted_hitboxes_shown:
+                        self.plot_hitbox(change.item)
+                else:
+                    self.remove_plotted_point(change.item, point_type)
+                    self.remove_plotted_hitbox(change.item)
+            case ChangeKind.CALCULATION_POINT:
+                if change.added:
+                    self.plot_point(change.item, PointType.CALCULATION)
+                else:
+                    self.remove_plotted_point(change.item, PointType.CALCULATION)
+            case ChangeKind.HIGHLIGHTED_PATH:
+                if self.plotted_highlighted_path:
+                    self.plotted_highlighted_path.remove()
+                    self.plotted_highlighted_path = None
+                if change.added:
+                    coords = get_coordinates(change.item)
+                    self.plotted_highlighted_path = self.ax.plot(
+                        coords[:, 0], coords[:, 1], linewidth=ROAD_WIDTH, color=HPATH_COLOR,
+                        zorder=0, animated=True)[0]
+
+    def select_point(self, point: Point):
+        """Draws <point> with SELECTED_P_COLOR until reset_plotted_point_colors() is called."""
+        self.plot_point(point, PointType.SELECTED)
+        self.selected_point = point
 
     def reset_plotted_point_colors(self):
-        for plotted_point in self.plotted_points.values():
-            plotted_point.set_color(NORMAL_P_COLOR)
+        if self.selected_point:
+            self.plotted_points[PointType.SELECTED].remove(self.selected_point)
+            self.selected_point = None
 
     def remove_plotted_point(self, point, point_type: PointType):
-        match point_type:
-            case PointType.NORMAL:
-                point_storage = self.plotted_points
-            case PointType.SELECTED:
-                point_storage = self.plotted_points
-            case PointType.CALCULATION:
-                point_storage = self.plotted_calculation_points
-        if point not in point_storage:
-            print("POINT NOT IN PLOTTED_POINTS DICT KEYS!")
-            return
-        point_storage[point].remove()
-        del point_storage[point]
+        if point_type != PointType.CALCULATION and point == self.selected_point:
+            self.reset_plotted_point_colors()
+        # points outside of the view are not plotted
+        self.plotted_points[point_type].remove(point)
 
     def remove_plotted_road(self, road):
-        if road not in self.plotted_lines.keys():
-            print("ROAD NOT IN PLOTTED_LINES DICT KEYS!")
-            return
-        self.plotted_lines[road].remove()
-        del self.plotted_lines[road]
+        self.road_numbers.pop(road, None)
+        self.plotted_lines.remove(road)
 
     def remove_plotted_hitbox(self, point: Point):
-        if point not in self.plotted_hitboxes.keys():
-            return
-        self.plotted_hitboxes[point].remove()
-        del self.plotted_hitboxes[point]
+        self.plotted_hitboxes.remove(point)
 
     def plot_road(self, road):
-        plotted_line = self.ax.plot(
-            road.xy[0], road.xy[1], linewidth=ROAD_WIDTH, color=ROAD_COLOR,
-            path_effects=[
-                pe.Stroke(linewidth=5, foreground='black'), pe.Normal()],
-            zorder=0, label=f"Road {self.counter()}, length {road.length}")[0]
-        self.plotted_lines[road] = plotted_line
+        if road not in self.road_numbers:
+            self.road_numbers[road] = self.counter()
+        self.plotted_lines.add(road, get_coordinates(road),
+                               label=f"Road {self.road_numbers[road]}, length {road.length}")
 
     def plot_point(self, point, point_type: PointType):
-        color = None
-        point_storage = self.plotted_points
-        match point_type:
-            case PointType.NORMAL:
-                color = NORMAL_P_COLOR
-            case PointType.SELECTED:
-                color = SELECTED_P_COLOR
-            case PointType.CALCULATION:
-                color = CALCULATION_P_COLOR
-                point_storage = self.plotted_calculation_points
-        plotted_point = self.ax.plot(
-            *point.xy, f"{color}o")[0]
-        point_storage[point] = plotted_point
+        self.plotted_points[point_type].add(point, (point.x, point.y), label=str(point))
 
     def plot_hitbox(self, point):
-        plotted_hitbox = self.ax.plot(*create_hitbox(point).exterior.xy)[0]
-        self.plotted_hitboxes[point] = plotted_hitbox
+        self.plotted_hitboxes.add(point, get_coordinates(create_hitbox(point)))
 
     def onkey(self, event):
         if event.key == "c":
@@ -337,7 +442,7 @@ class UI:
         else:
             print("Invalid input!")
 
-        self.redraw()  # CHECKS ENTIRE MAP FOR THINGS TO REDRAW
+        self.redraw()
 
     def onclick(self, event):
         if PRINT_CLICK_INFO:
@@ -360,9 +465,7 @@ class UI:
         else:
             print("Invalid input!")
 
-        self.redraw()  # CHECKS ENTIRE MAP FOR THINGS TO REDRAW
-        if not NO_CURSOR:
-            self.create_cursor()
+        self.redraw()
 
     def zoom(self, event):
         # get the current x and y limits
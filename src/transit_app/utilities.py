@@ -1,8 +1,10 @@
 from dataclasses import dataclass, field
 
-from shapely import LineString, Point, Polygon, box, equals, snap
+from shapely import LineString, Point, Polygon, box, equals
 
 from .constants import HITBOX_SIZE, MIN_DISTANCE_WHEN_PLACING_POINT
+from .instrumentation import metrics
+from .spatial_index import SpatialIndex
 
 
 @dataclass
@@ -80,6 +82,46 @@ class CreateCrossroadsOutput:
         return new_text
 
 
+@dataclass
+class AddRoadsBulkOutput:
+    error: str = ""
+    roads: list[LineString] = field(default_factory=list)
+    new_crossroads: list[Point] = field(default_factory=list)
+    rejected: dict[int, str] = field(default_factory=dict)  # segment index: reason
+
+    def __str__(self) -> str:
+        if len(self.error) > 0:
+            return self.error
+        new_text = f"Added {len(self.roads)} roads and {len(self.new_crossroads)} crossroads"
+        if self.rejected:
+            new_text += f"\n{len(self.rejected)} segments were not added:"
+            for index, reason in self.rejected.items():
+                new_text += f"\n{index}: {reason}"
+        return new_text
+
+
+@dataclass
+class LoadNetworkOutput:
+    error: str = ""
+    network: object = None
+    segments: int = 0  # amount of segments read from the file
+    rejected: dict[int, str] = field(default_factory=dict)  # segment index: reason
+    seconds: float = 0
+
+    @property
+    def segments_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0
+        return self.segments / self.seconds
+
+    def __str__(self) -> str:
+        if len(self.error) > 0:
+            return self.error
+        return (f"Loaded {self.segments} segments in {self.seconds:.2f} s "
+                f"({self.segments_per_second:.0f} segments/s), "
+                f"{len(self.rejected)} segments were not added")
+
+
 def create_hitbox(point: Point) -> Polygon:
     """Creates a hitbox around a point. Used when the user wants to click the point."""
     b = point.bounds
@@ -88,10 +130,33 @@ def create_hitbox(point: Point) -> Polygon:
     return box(*new_b)
 
 
-def point_near_point(point: Point, all_points: list):
+def point_in_hitbox(point: Point, points: list, hitboxes: dict):
+    """Returns the first point in <points> whose hitbox in <hitboxes> contains <point>,
+    or False if there is none."""
+    for other_point in points:
+        if point.within(hitboxes[other_point]):
+            return other_point
+    return False
+
+
+def nearby_geometries(geometry, geometries: list | SpatialIndex,
+                      predicate: str = None, distance: float = None):
+    """Returns the geometries in <geometries> that might satisfy <predicate> with <geometry>.
+    If <geometries> is a SpatialIndex, only the matching geometries are returned,
+    otherwise the whole list is returned and the caller has to check every geometry.
+    Counts the returned geometries, since the caller evaluates a predicate for each of them."""
+    if isinstance(geometries, SpatialIndex):
+        geometries = geometries.query(geometry, predicate=predicate, distance=distance)
+    if metrics.enabled:
+        metrics.count("utilities.geometries_checked", len(geometries))
+    return geometries
+
+
+def point_near_point(point: Point, all_points: list | SpatialIndex):
     """Returns a list of points that are near <point>, or False if none were found."""
     nearby_points = []
-    for existing_point in all_points:
+    for existing_point in nearby_geometries(point, all_points, "dwithin",
+                                            MIN_DISTANCE_WHEN_PLACING_POINT):
         if (point is not existing_point and
                 point.dwithin(existing_point, MIN_DISTANCE_WHEN_PLACING_POINT)):
             nearby_points.append(existing_point)
@@ -100,47 +165,64 @@ def point_near_point(point: Point, all_points: list):
     return nearby_points
 
 
-def find_road_that_has_point(point: Point, roads: list):
+def find_road_that_has_point(point: Point, roads: list | SpatialIndex):
     """Returns the road that contains <point>, or False if none exist.
     Due to floating point issues the point is never actually on the road, 
     only very close to it, so dwithin() has to be used."""
-    for road in roads:
+    for road in nearby_geometries(point, roads, "dwithin", 1e-8):
         if point.dwithin(road, 1e-8):
             return road
     return False
 
 
-def find_and_move_road(point: Point, roads: list):
-    """Finds the road that contains <point>, and snaps said road to <point>. 
-    Returns False if no such road exists.
-    Due to floating point issues the point is never actually on the road, 
-    only very close to it, so dwithin() has to be used."""
-    for road in roads.copy():
-        if point.dwithin(road, 1e-8):
-            roads.remove(road)
-            new_road = snap(road, point, 0.0001)
-            roads.append(new_road)
-            return new_road
-    return False
+def road_end_distances(point: Point, road: LineString) -> dict:
+    """Returns {coordinates: distance} pairs for both ends of <road>, 
+    where distance is measured along the road from <point>, which must be on the road."""
+    distance = road.project(point)
+    return {road.coords[0]: distance, road.coords[-1]: road.length - distance}
+
+
+def path_points(start_point: Point, nodes: list, end_point: Point) -> list:
+    """Returns the coordinates of a path that starts from <start_point>, goes through <nodes>
+    and ends at <end_point>. The points are not repeated if they are already the first or last node."""
+    points = list(nodes)
+    if not points or points[0] != start_point.coords[0]:
+        points.insert(0, start_point.coords[0])
+    if points[-1] != end_point.coords[0]:
+        points.append(end_point.coords[0])
+    return points
+
+
+def split_line(road: LineString, split_points: list) -> list:
+    """Returns the parts of <road> between its ending points and <split_points>.
+    The points must be on the road, and can be in any order."""
+    coords = [road.coords[0]]
+    for point in sorted(split_points, key=road.project):
+        coords.append(point.coords[0])
+    coords.append(road.coords[-1])
+    return [LineString(part) for part in zip(coords, coords[1:])]
 
 
-def point_ends_road(point: Point, roads: list):
+def point_ends_road(point: Point, roads: list | SpatialIndex):
     """Returns True if <point> is the start or end point of any existing road, 
     or False otherwise."""
     road: LineString
-    for road in roads:
+    for road in nearby_geometries(point, roads):
         if equals(point, Point(road.coords[0])) or equals(point, Point(road.coords[1])):
             return True
     return False
 
 
-def invalid_point_placement(point: Point, all_points: list, roads: list):
+def invalid_point_placement(point: Point, all_points: list | SpatialIndex,
+                            roads: list | SpatialIndex):
     """Returns True if added point is very near an existing point or an existing road, 
     or False otherwise."""
-    for existing_point in all_points:
+    for existing_point in nearby_geometries(point, all_points, "dwithin",
+                                            MIN_DISTANCE_WHEN_PLACING_POINT):
         if point.dwithin(existing_point, MIN_DISTANCE_WHEN_PLACING_POINT):
             return True
-    for existing_road in roads:
+    for existing_road in nearby_geometries(point, roads, "dwithin",
+                                           MIN_DISTANCE_WHEN_PLACING_POINT):
         if point.dwithin(existing_road, MIN_DISTANCE_WHEN_PLACING_POINT):
             return True
     return False
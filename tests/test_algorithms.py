@@ -0,0 +1,159 @@
+import unittest
+
+from src.transit_app.algorithms import (DFS, AStar, BidirectionalDijkstra,
+                                       ContractionHierarchy, CSRGraph,
+                                       Dijkstra, Graph, find_segment_crossings,
+                                       merge_collinear_segments,
+                                       segment_intersection)
+
+
+def create_grid(size: int) -> Graph:
+    """Returns a <size> x <size> grid where neighboring nodes are 1 apart."""
+    graph = Graph()
+    for x in range(size):
+        for y in range(size):
+            for other in ((x + 1, y), (x, y + 1)):
+                if max(other) < size:
+                    graph.add_edge((x, y), other, 1)
+                    graph.add_edge(other, (x, y), 1)
+    return graph
+
+
+class TestDFS(unittest.TestCase):
+
+    def test_long_chain_does_not_recurse(self):
+        nodes = list(range(100000))
+        dfs = DFS(nodes)
+        for i in range(1, len(nodes)):
+            dfs.add_edge(i - 1, i)
+        self.assertEqual(len(dfs.search(0)), len(nodes))
+        self.assertEqual(dfs.traverse(0), nodes)
+
+    def test_breadth_first_order(self):
+        dfs = DFS(["a", "b", "c", "d"])
+        dfs.add_edge("a", "b")
+        dfs.add_edge("b", "d")
+        dfs.add_edge("a", "c")
+        self.assertEqual(dfs.traverse("a"), ["a", "b", "d", "c"])
+        self.assertEqual(dfs.traverse("a", breadth_first=True),
+                         ["a", "b", "c", "d"])
+
+    def test_label_components(self):
+        graph = Graph()
+        graph.add_edge((0, 0), (1, 0), 1)
+        graph.add_edge((1, 0), (0, 0), 1)
+        graph.add_edge((5, 5), (6, 5), 1)
+        graph.add_edge((6, 5), (5, 5), 1)
+        labels = DFS.from_graph(graph).label_components()
+        self.assertEqual(labels, {(0, 0): 0, (1, 0): 0, (5, 5): 1, (6, 5): 1})
+
+
+class TestShortestPaths(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.graph = create_grid(20)
+
+    def test_astar_matches_dijkstra(self):
+        path, distance = Dijkstra(self.graph).find_distances((0, 0), (5, 7))
+        astar_path, astar_distance = AStar(
+            self.graph).find_distances((0, 0), (5, 7))
+        self.assertEqual(astar_distance, distance)
+        self.assertEqual(len(astar_path), len(path))
+        self.assertEqual(astar_path[-1], (5, 7))
+
+    def test_astar_stops_at_end_node(self):
+        astar = AStar(self.graph)
+        astar.find_distances((0, 0), (3, 0))
+        self.assertLess(len(astar.distances), len(self.graph) // 4)
+
+    def test_bidirectional_matches_dijkstra(self):
+        for end_node in ((5, 7), (19, 19), (0, 1), (0, 0)):
+            path, distance = Dijkstra(
+                self.graph).find_distances((0, 0), end_node)
+            bidirectional_path, bidirectional_distance = BidirectionalDijkstra(
+                self.graph).find_distances((0, 0), end_node)
+            self.assertEqual(bidirectional_distance, distance)
+            self.assertEqual(len(bidirectional_path), len(path))
+            self.assertEqual(bidirectional_path[0], (0, 0))
+            self.assertEqual(bidirectional_path[-1], end_node)
+
+    def test_contraction_hierarchy_matches_dijkstra(self):
+        hierarchy = ContractionHierarchy(self.graph).build()
+        self.assertEqual(len(hierarchy.rank), len(self.graph))
+        for end_node in ((5, 7), (19, 19), (0, 1)):
+            path, distance = Dijkstra(
+                self.graph).find_distances((0, 0), end_node)
+            ch_path, ch_distance = hierarchy.find_distances((0, 0), end_node)
+            self.assertEqual(ch_distance, distance)
+            # shortcuts are unpacked to the original edges
+            self.assertEqual(len(ch_path), len(path))
+            for node_a, node_b in zip(ch_path, ch_path[1:]):
+                self.assertTrue(self.graph.has_edge(node_a, node_b))
+
+    def test_csr_graph_matches_graph(self):
+        csr_graph = CSRGraph.from_graph(self.graph)
+        self.assertEqual(len(csr_graph), len(self.graph))
+        start = csr_graph.node_id((0, 0))
+        end = csr_graph.node_id((5, 7))
+        path, distance = Dijkstra(csr_graph).find_distances(start, end)
+        self.assertEqual(distance, 12)
+        self.assertEqual(csr_graph.position(path[-1]), (5, 7))
+        path, distance = AStar(csr_graph).find_distances(start, end)
+        self.assertEqual(distance, 12)
+
+
+class TestCSRGraph(unittest.TestCase):
+
+    def test_changes_after_building_arrays(self):
+        graph = CSRGraph()
+        a, b, c = (graph.add_node(position)
+                   for position in ((0, 0), (1, 0), (2, 0)))
+        graph.add_edge(a, b, 1)
+        graph.add_edge(b, c, 1)
+        graph.compact()
+        a, b, c = (graph.node_id(position)
+                   for position in ((0, 0), (1, 0), (2, 0)))
+        graph.remove_edge(a, b)
+        graph.add_edge(a, c, 5)
+        graph.add_edge(b, c, 0.5)
+        self.assertFalse(graph.has_edge(a, b))
+        self.assertEqual(list(graph.neighbors(a)), [(c, 5)])
+        self.assertEqual(list(graph.neighbors(b)), [(c, 0.5)])
+        self.assertEqual(graph.edge_count, 2)
+
+        graph.compact()
+        a, b, c = (graph.node_id(position)
+                   for position in ((0, 0), (1, 0), (2, 0)))
+        self.assertEqual(list(graph.neighbors(a)), [(c, 5)])
+        self.assertEqual(list(graph.neighbors(b)), [(c, 0.5)])
+        self.assertEqual(len(graph.targets), 2)
+
+
+class TestSegmentCrossings(unittest.TestCase):
+
+    def test_sweep_finds_crossings(self):
+        segments = [((0, 0), (4, 4)), ((0, 4), (4, 0)), ((5, 0), (5, 4)),
+                    ((4, 4), (6, 4)), ((1, 2), (3, 2))]
+        self.assertEqual(find_segment_crossings(segments), [
+            (0, 1, (2.0, 2.0)), (0, 3, (4, 4)), (0, 4, (2.0, 2.0)),
+            (1, 4, (2.0, 2.0)), (2, 3, (5.0, 4.0))])
+
+    def test_collinear_segments(self):
+        self.assertEqual(segment_intersection(((0, 0), (2, 0)), ((1, 0), (3, 0))),
+                         ((1, 0), (2, 0)))
+        self.assertEqual(segment_intersection(((0, 0), (2, 0)), ((2, 0), (3, 0))), (2, 0))
+        self.assertIsNone(segment_intersection(((0, 0), (2, 0)), ((3, 0), (4, 0))))
+
+    def test_shared_ending_point_is_exact(self):
+        # computing this point from the segments gives (7.869999999999999, 13.7)
+        self.assertEqual(segment_intersection(((5.32, 18.6), (7.87, 13.7)),
+                                              ((6.58, 12.08), (7.87, 13.7))), (7.87, 13.7))
+        self.assertEqual(segment_intersection(((7.87, 13.7), (5.32, 18.6)),
+                                              ((6.58, 12.08), (7.87, 13.7))), (7.87, 13.7))
+
+    def test_merge_collinear_segments(self):
+        segments = [((0, 0), (1, 0)), ((2, 0), (1, 0)), ((2, 0), (3, 0)),  # one line split twice
+                    ((1, 0), (1, 2)), ((1, 2), (1, 3)),  # joins the line but turns
+                    ((5, 5), (6, 6)), ((6, 6), (7, 7.5)), ((4, 4), (4, 4))]
+        self.assertEqual(sorted(merge_collinear_segments(segments)), [
+            ((0, 0), (3, 0)), ((1, 0), (1, 3)), ((5, 5), (6, 6)), ((6, 6), (7, 7.5))])
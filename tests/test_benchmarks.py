@@ -0,0 +1,41 @@
+import unittest
+
+from benchmarks.generators import GENERATORS, grid_city
+from benchmarks.runner import compare, percentile, run
+from src.transit_app.instrumentation import metrics
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_generators_are_deterministic(self):
+        for generator in GENERATORS.values():
+            self.assertEqual(generator(20, seed=1), generator(20, seed=1))
+        self.assertEqual(len(grid_city(4)), 8)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([3], 0.9), 3)
+
+    def test_run(self):
+        results = run(["grid_city"], [3])
+        case = results["cases"][0]
+        # 6 roads that cross each other 9 times
+        self.assertEqual(case["roads"], 24)
+        operations = case["operations"]
+        self.assertEqual(operations["add_point"]["calls"], 12)
+        self.assertEqual(operations["find_shortest_path_ch"]["calls"], 50)
+        self.assertIn("1.00x", compare(results, results))
+
+    def test_run_keeps_metrics_state(self):
+        metrics.enable()
+        metrics.count("outside")
+        try:
+            results = run(["long_chain"], [5], collect_metrics=True)
+            self.assertTrue(metrics.enabled)
+            self.assertEqual(metrics.report()["counters"], {"outside": 1})
+        finally:
+            metrics.disable()
+            metrics.reset()
+        self.assertIn("network.add_roads_bulk", results["cases"][0]["metrics"]["timers"])
@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src.transit_app.cli import iter_pairs, main, write_results
+from src.transit_app.network import Network
+from src.transit_app.snapshot import save_snapshot
+
+
+class TestCLI(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.network = Network()
+        self.network.add_roads_bulk([((0, 1), (4, 1)), ((1, 0), (1, 2)), ((3, 0), (3, 2)),
+                                     ((10, 10), (12, 10))])
+
+    def test_write_results(self):
+        pairs = iter_pairs(io.StringIO(
+            '{"origin": [1, 0.1], "destination": [3, 1.9]}\n'
+            '{"origin": [1, 0], "destination": [11, 10.1]}\n'
+            '{"origin": [50, 50], "destination": [1, 1]}\n'))
+        output = io.StringIO()
+        self.assertEqual(write_results(pairs, self.network, output, "jsonl", paths=True), 3)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertAlmostEqual(lines[0]["distance"], 3.8)
+        self.assertEqual(lines[0]["path"], [[1, 0.1], [1, 1], [3, 1], [3, 1.9]])
+        self.assertEqual(lines[1]["error"], "Point1 and Point2 are not connected!")
+        self.assertIsNone(lines[2]["distance"])
+
+    def test_main_with_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            network_path = os.path.join(directory, "network.tnet")
+            pairs_path = os.path.join(directory, "pairs.csv")
+            output_path = os.path.join(directory, "output.csv")
+            save_snapshot(self.network, network_path)
+            with open(pairs_path, "w", encoding="utf-8") as file:
+                file.write("x1,y1,x2,y2\n1,0,3,2\n")
+            self.assertEqual(main([network_path, "--pairs", pairs_path, "--output", output_path,
+                                   "--algorithm", "ch"]), 0)
+            with open(output_path, encoding="utf-8") as file:
+                self.assertEqual(file.read().splitlines(),
+                                 ["index,x1,y1,x2,y2,distance,error", "0,1.0,0.0,3.0,2.0,4.0,"])
+
+    def test_ui_libraries_are_not_imported(self):
+        code = ("import sys, src.transit_app.cli; "
+                "print([name for name in ('tkinter', 'matplotlib') if name in sys.modules])")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
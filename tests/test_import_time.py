@@ -0,0 +1,42 @@
+import subprocess
+import sys
+import unittest
+
+# Importing the core modules may take at most this many seconds.
+# Most of it is shapely and numpy, the modules of this package take a few milliseconds.
+IMPORT_TIME_BUDGET = 0.75
+# Modules that only the UI needs
+UI_MODULES = ("tkinter", "matplotlib")
+
+
+def import_time(modules: list) -> tuple:
+    """Imports <modules> in a new interpreter with python -X importtime.
+    Returns the total import time in seconds and the names of every imported module."""
+    code = "import sys; import " + ", ".join(modules) + "; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            # top level imports, their cumulative times include everything they import
+            total += int(cumulative)
+    return total / 1_000_000, result.stdout.split()
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_core_import_time(self):
+        modules = ["src.transit_app.network", "src.transit_app.algorithms"]
+        # the fastest of a few runs, so that a busy machine does not fail the test
+        seconds, imported = min(import_time(modules) for _ in range(3))
+        self.assertLess(seconds, IMPORT_TIME_BUDGET)
+        for name in UI_MODULES:
+            self.assertNotIn(name, imported)
+
+    def test_algorithms_only_use_standard_library(self):
+        _, imported = import_time(["src.transit_app.algorithms"])
+        self.assertNotIn("shapely", imported)
+        self.assertNotIn("numpy", imported)
@@ -0,0 +1,61 @@
+import contextlib
+import io
+import unittest
+
+from shapely import Point
+
+from src.transit_app.instrumentation import Metrics, metrics
+from src.transit_app.network import Network
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.network = Network()
+        self.network.add_roads_bulk([((0, 1), (4, 1)), ((1, 0), (1, 2)), ((3, 0), (3, 2))])
+        metrics.reset()
+
+    def tearDown(self) -> None:
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled_metrics_collect_nothing(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.network.find_shortest_path(Point(1, 0), Point(3, 2))
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(metrics.report(), {"timers": {}, "counters": {}})
+
+    def test_enabled_metrics(self):
+        metrics.enable()
+        self.network.find_shortest_path(Point(1, 0), Point(3, 2))
+        self.network.find_shortest_path(Point(1, 0), Point(3, 2))
+        report = metrics.report()
+        self.assertEqual(report["timers"]["network.find_shortest_path"]["calls"], 2)
+        self.assertEqual(report["timers"]["network.find_shortest_path.dijkstra"]["calls"], 1)
+        self.assertEqual(report["counters"]["network.path_cache_hits"], 1)
+        self.assertEqual(report["counters"]["dijkstra.searches"], 1)
+        self.assertGreater(report["counters"]["dijkstra.nodes_settled"], 0)
+        self.assertGreater(report["counters"]["utilities.geometries_checked"], 0)
+
+    def test_collecting_restores_previous_state(self):
+        metrics.enable()
+        metrics.count("outside")
+        with metrics.collecting(False):
+            self.network.find_shortest_path(Point(1, 0), Point(3, 2))
+            self.assertEqual(metrics.report(), {"timers": {}, "counters": {}})
+        with self.assertRaises(ValueError), metrics.collecting():
+            metrics.count("inside")
+            raise ValueError
+        self.assertTrue(metrics.enabled)
+        self.assertEqual(metrics.report()["counters"], {"outside": 1})
+
+    def test_timer(self):
+        own_metrics = Metrics(enabled=True)
+        for _ in range(3):
+            with own_metrics.timer("work"):
+                pass
+        own_metrics.count("items", 5)
+        report = own_metrics.report()
+        self.assertEqual(report["timers"]["work"]["calls"], 3)
+        self.assertEqual(report["counters"], {"items": 5})
@@ -0,0 +1,55 @@
+import io
+import json
+import unittest
+
+from shapely import LineString
+
+from src.transit_app.loader import (iter_csv_segments, iter_geojson_segments,
+                                    load_segments)
+
+
+class TestLoader(unittest.TestCase):
+
+    def test_geojson_is_read_in_small_pieces(self):
+        collection = {
+            "type": "FeatureCollection",
+            "name": "features",
+            "features": [
+                {"type": "Feature", "properties": {"id": 1},
+                 "geometry": {"type": "LineString", "coordinates": [[0, 0], [1.5, 0], [1.5, 2]]}},
+                {"type": "Feature", "properties": {},
+                 "geometry": {"type": "Point", "coordinates": [5, 5]}},
+                {"type": "Feature", "properties": {},
+                 "geometry": {"type": "MultiLineString", "coordinates": [[[3, 3, 1], [4, 4, 1]]]}},
+            ],
+            "crs": 12345,
+        }
+        text = json.dumps(collection, indent=1)
+        segments = list(iter_geojson_segments(io.StringIO(text), read_size=7))
+        self.assertEqual(segments, [((0, 0), (1.5, 0)), ((1.5, 0), (1.5, 2)),
+                                    ((3, 3), (4, 4))])
+
+        with self.assertRaises(ValueError):
+            list(iter_geojson_segments(io.StringIO(text[:60]), read_size=7))
+
+    def test_csv_with_and_without_header(self):
+        text = "id,x2,y2,x1,y1\n1,1,1,0,0\n2,2,0,1,1\n"
+        self.assertEqual(list(iter_csv_segments(io.StringIO(text))),
+                         [((0, 0), (1, 1)), ((1, 1), (2, 0))])
+        self.assertEqual(list(iter_csv_segments(io.StringIO("0,0,1,1\n"))),
+                         [((0, 0), (1, 1))])
+
+    def test_load_segments_in_chunks(self):
+        segments = [((0, 1), (4, 1)), ((1, 0), (1, 2)), ((3, 0), (3, 2)), ((1.1, 0), (1.1, 2))]
+        outputs = []
+        output = load_segments(iter(segments), chunk_size=2,
+                               progress=lambda output: outputs.append(output.segments))
+        self.assertEqual(output.error, "")
+        self.assertEqual(outputs, [2, 4])
+        self.assertEqual(output.segments, 4)
+        self.assertEqual(list(output.rejected), [3])
+        self.assertEqual(len(output.network.roads), 7)
+        self.assertIn(LineString([(1, 1), (3, 1)]), output.network.roads)
+
+        output = load_segments(iter_csv_segments(io.StringIO("0,0,1,1\n0,x,1,1\n")))
+        self.assertIn("row 2", output.error)
@@ -2,6 +2,7 @@ import unittest
 
 from shapely import LineString, Point
 
+from src.transit_app.changes import ChangeKind
 from src.transit_app.network import Network
 
 
@@ -103,3 +104,249 @@ class TestNetwork(unittest.TestCase):
         self.network.add_point(point4)
         self.assertEqual(len(self.network.roads), 1)
         self.assertEqual(len(self.network.crossroads), 0)
+
+    def test_road_crossing_many_roads(self):
+        for start, end in [((1, 0), (1, 2)), ((3, 0), (3, 2)), ((0, 1), (4, 1))]:
+            self.network.add_point(Point(start))
+            self.network.add_point(Point(end))
+        # new road splits both existing roads and is split into 3 parts
+        self.assertEqual(len(self.network.roads), 7)
+        self.assertEqual(len(self.network.crossroads), 2)
+        self.assertAlmostEqual(
+            sum(road.length for road in self.network.roads), 8)
+        self.assertIn(LineString([(1, 1), (3, 1)]), self.network.roads)
+
+    def test_add_roads_bulk(self):
+        self.network.add_point(Point(3, 0))
+        self.network.add_point(Point(3, 2))
+        output = self.network.add_roads_bulk([
+            ((1, 0), (1, 2)),
+            LineString([(0, 1), (4.1, 1)]),
+            ((1.2, 0.1), (1.2, 2)),  # too close to the first road
+            ((4, 1.1), (6, 1)),  # starts from the hitbox of the end of the second road
+            ((5, 0), (5, 3)),
+        ])
+        self.assertEqual(list(output.rejected), [2])
+        self.assertEqual(len(self.network.crossroads), 3)
+        self.assertEqual(len(self.network.roads), 11)
+        self.assertAlmostEqual(
+            sum(road.length for road in self.network.roads), 2 + 2 + 4.1 + 1.9 + 3)
+        self.assertIn(LineString([(1, 1), (3, 1)]), self.network.roads)
+        self.assertIn(LineString([(4.1, 1), (5, 1)]), self.network.roads)
+        self.assertTrue(self.network.connected(Point(1, 0), Point(5, 3)))
+
+    def test_add_roads_bulk_starting_from_new_crossroad(self):
+        # the last segment starts from the hitbox of the crossroad of the first two, and its crossing
+        # with the first road is a rounding error away from that crossroad
+        segments = [((16.71, 9.94), (21.39, 5.0)), ((19.95, 7.77), (17.25, 1.65)),
+                    ((19.5, 7.03), (19.98, 12.28))]
+        output = self.network.add_roads_bulk(segments)
+        self.assertEqual(output.rejected, {})
+        self.assertEqual(len(self.network.crossroads), 1)
+        self.assertEqual(len(self.network.roads), 5)
+
+        network = Network()
+        for segment in segments:
+            for coord in segment:
+                network.add_point(Point(coord))
+        self.assertEqual(len(network.roads), 5)
+
+    def test_stats_follow_roads(self):
+        self.network.add_point(Point(0, 1))
+        self.network.add_point(Point(4, 1))
+        self.network.add_point(Point(1, 0))
+        self.network.add_point(Point(1, 3))  # splits the first road
+        self.network.add_roads_bulk([((10, 10), (10, 15))])
+        stats = self.network.stats
+        self.assertEqual(stats["road_amount"], 5)
+        self.assertEqual(stats["shortest_road_length"], 1)
+        self.assertEqual(stats["longest_road_length"], 5)
+        self.assertAlmostEqual(stats["total_road_length"], 4 + 3 + 5)
+        self.assertEqual(stats["crossroad_amount"], 1)
+        self.assertEqual(stats["component_amount"], 2)
+        self.assertEqual(stats["degree_histogram"], {1: 6, 4: 1})
+
+    def test_snapping_to_nearest_road(self):
+        # both roads are near enough, but the road that was added first is further away
+        output = self.network.add_roads_bulk([((0, 0), (10, 0)), ((10.3, -5), (10.3, 5))])
+        self.assertEqual(len(output.rejected), 0)
+        point, road = self.network.snap_to_road(Point(10.18, 0))
+        self.assertEqual(road, LineString([(10.3, -5), (10.3, 5)]))
+        self.assertEqual(point, Point(10.3, 0))
+
+    def test_changes(self):
+        self.network.add_point(Point(0, 1))
+        self.network.add_point(Point(4, 1))
+        self.assertEqual(len(self.network.changes), 0)  # not recorded before record_changes()
+        self.network.record_changes()
+        self.assertEqual({change.kind for change in self.network.changes.drain()},
+                         {ChangeKind.ROAD, ChangeKind.POINT})
+
+        self.network.add_point(Point(1, 0))
+        self.assertEqual([(change.kind, change.added) for change in self.network.changes.drain()],
+                         [(ChangeKind.TEMP_POINT, True)])
+        self.network.add_point(Point(1, 3))
+        changes = self.network.changes.drain()
+        self.assertIn((ChangeKind.TEMP_POINT, Point(1, 0), False), changes)
+        self.assertIn((ChangeKind.POINT, Point(1, 0), True), changes)
+        self.assertIn((ChangeKind.POINT, Point(1, 1), True), changes)
+        self.assertIn((ChangeKind.ROAD, LineString([(0, 1), (4, 1)]), False), changes)
+        self.assertEqual(sum(change.kind == ChangeKind.ROAD and change.added for change in changes), 4)
+        # a temp point that was added and removed before drain() is left out
+        self.assertNotIn(ChangeKind.TEMP_POINT, [change.kind for change in changes if change.added])
+
+        self.network.add_calculation_point(Point(0.5, 1))
+        self.network.add_calculation_point(Point(1, 2.5))
+        self.assertEqual({change.kind for change in self.network.changes.drain()},
+                         {ChangeKind.CALCULATION_POINT, ChangeKind.HIGHLIGHTED_PATH})
+        self.network.add_calculation_point(Point(3, 1))
+        changes = self.network.changes.drain()
+        self.assertEqual(sum(not change.added for change in changes), 3)
+        self.assertIsNone(self.network.highlighted_path)
+
+    def test_routing_graph_follows_roads(self):
+        self.network.add_point(Point(0, 1))
+        self.network.add_point(Point(2, 1))
+        self.network.add_point(Point(1, 0))
+        self.network.add_point(Point(1, 2))
+        graph = self.network.routing_graph
+        self.assertEqual(len(graph), 5)
+        self.assertEqual(graph.degree(graph.node_id((1, 1))), 4)
+        self.assertFalse(graph.has_edge(
+            graph.node_id((0, 1)), graph.node_id((2, 1))))
+
+        def edges():
+            return {graph.position(node): sorted((graph.position(neighbor), weight)
+                                                 for neighbor, weight in graph.neighbors(node))
+                    for node in graph.nodes()}
+
+        edges_before = edges()
+        output = self.network.find_shortest_path(Point(0.5, 1), Point(1, 1.5))
+        self.assertAlmostEqual(output.end_distance, 1)
+        # edges added for the query are removed afterwards
+        self.assertEqual(edges(), edges_before)
+
+    def test_connected(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(2, 0))
+        self.network.add_point(Point(0, 3))
+        self.network.add_point(Point(2, 3))
+        self.assertFalse(self.network.connected(Point(1, 0), Point(1, 3)))
+        output = self.network.find_shortest_path(Point(1, 0), Point(1, 3))
+        self.assertEqual(output.error, "Point1 and Point2 are not connected!")
+
+        self.network.add_point(Point(2, 0))
+        self.network.add_point(Point(2, 3))
+        self.assertTrue(self.network.connected(Point(1, 0), Point(1, 3)))
+        self.assertEqual(self.network.components.count, 1)
+
+    def test_shortest_path_algorithms(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(4, 0))
+        self.network.add_point(Point(4, 0))
+        self.network.add_point(Point(4, 4))
+        for algorithm in ("dijkstra", "astar", "bidirectional", "ch"):
+            output = self.network.find_shortest_path(
+                Point(1, 0), Point(4, 1), algorithm=algorithm)
+            self.assertEqual(output.points, [(1, 0), (4, 0), (4, 1)])
+            self.assertAlmostEqual(output.end_distance, 4)
+            # both points on the same road
+            output = self.network.find_shortest_path(
+                Point(3, 0), Point(1, 0), algorithm=algorithm)
+            self.assertEqual(output.points, [(3, 0), (1, 0)])
+            self.assertAlmostEqual(output.end_distance, 2)
+        output = self.network.find_shortest_path(
+            Point(1, 0), Point(4, 1), algorithm="unknown")
+        self.assertTrue(output.error)
+
+    def test_contraction_hierarchy_is_rebuilt_after_changes(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(4, 0))
+        self.network.build_contraction_hierarchy()
+        output = self.network.find_shortest_path(
+            Point(1, 0), Point(3, 0), algorithm="ch")
+        self.assertEqual(output.points, [(1, 0), (3, 0)])
+        self.assertAlmostEqual(output.end_distance, 2)
+
+        self.network.add_point(Point(2, -1))
+        self.network.add_point(Point(2, 1))
+        self.assertIsNone(self.network.contraction_hierarchy)
+        output = self.network.find_shortest_path(
+            Point(1, 0), Point(2, 0.5), algorithm="ch")
+        self.assertEqual(output.points, [(1, 0), (2, 0), (2, 0.5)])
+        self.assertAlmostEqual(output.end_distance, 1.5)
+
+    def test_distance_matrix(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(4, 0))
+        self.network.add_point(Point(4, 0))
+        self.network.add_point(Point(4, 4))
+        self.network.add_point(Point(8, 8))
+        self.network.add_point(Point(9, 9))
+        sources = [Point(1, 0.1), Point(4, 3)]
+        targets = [Point(3, 0), Point(4, 1), Point(8.5, 8.5), Point(2, 6)]
+        matrix, paths = self.network.distance_matrix(
+            sources, targets, return_paths=True)
+        self.assertEqual(matrix.shape, (2, 4))
+        self.assertAlmostEqual(matrix[0, 0], 2)
+        self.assertAlmostEqual(matrix[0, 1], 4)
+        self.assertAlmostEqual(matrix[1, 0], 4)
+        self.assertAlmostEqual(matrix[1, 1], 2)
+        # not connected, and not near any road
+        self.assertEqual(matrix[0, 2], float("inf"))
+        self.assertEqual(matrix[0, 3], float("inf"))
+        self.assertEqual(paths[0][1], [(1, 0), (4, 0), (4, 1)])
+        self.assertEqual(paths[1][1], [(4, 3), (4, 1)])
+        self.assertIsNone(paths[0][2])
+
+    def test_shortest_path_to_same_point(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(2, 0))
+        for algorithm in ("dijkstra", "ch"):
+            output = self.network.find_shortest_path(Point(1, 0), Point(1, 0), algorithm)
+            self.assertEqual(output.error, "")
+            self.assertEqual(output.end_distance, 0)
+
+    def test_shortest_path_cache(self):
+        self.network.add_point(Point(0, 0))
+        self.network.add_point(Point(4, 0))
+        first = self.network.find_shortest_path(Point(1, 0), Point(3, 0))
+        second = self.network.find_shortest_path(Point(1, 0), Point(3, 0))
+        self.assertEqual(second.points, first.points)
+        self.assertEqual(self.network.path_cache.hits, 1)
+        self.assertEqual(self.network.path_cache.misses, 1)
+
+        # changing the roads makes cached results out of date
+        self.network.add_point(Point(2, -1))
+        self.network.add_point(Point(2, 1))
+        output = self.network.find_shortest_path(Point(1, 0), Point(3, 0))
+        self.assertEqual(output.points, [(1, 0), (2, 0), (3, 0)])
+        self.assertEqual(self.network.path_cache.misses, 2)
+
+    def test_shortest_path_cache_size(self):
+        network = Network(cache_size=1)
+        network.add_point(Point(0, 0))
+        network.add_point(Point(4, 0))
+        network.find_shortest_path(Point(1, 0), Point(3, 0))
+        network.find_shortest_path(Point(1, 0), Point(2, 0))
+        network.find_shortest_path(Point(1, 0), Point(3, 0))
+        self.assertEqual(len(network.path_cache), 1)
+        self.assertEqual(network.path_cache.hits, 0)
+
+    def test_queries_do_not_grow_routing_graph(self):
+        network = Network(cache_size=0)
+        network.add_roads_bulk([((0, 1), (8, 1)), ((2, 0), (2, 4)), ((6, 0), (6, 4))])
+        graph = network.routing_graph
+
+        def sizes():
+            return (len(graph.positions) + len(graph.new_positions), len(graph.node_ids),
+                    len(graph.added), len(graph.removed), graph.changes, graph.edge_count)
+
+        network.find_shortest_path(Point(1, 1), Point(6, 3))
+        before = sizes()
+        for i in range(200):
+            algorithm = ["dijkstra", "astar", "bidirectional"][i % 3]
+            output = network.find_shortest_path(Point(0.5 + i % 7, 1), Point(6, 0.5 + i % 3),
+                                                algorithm)
+            self.assertFalse(output.error)
+        self.assertEqual(sizes(), before)
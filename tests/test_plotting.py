@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from matplotlib.figure import Figure
+
+from src.transit_app.plotting import PointLayer, _Layer
+
+
+class _ListLayer(_Layer):
+    """A layer whose collection is a plain list."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.collection = []
+
+    def _update_collection(self):
+        self.collection = list(self.data)
+
+
+class TestLayer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.layer = _ListLayer()
+
+    def assert_consistent(self, expected: dict):
+        """Checks that the layer contains the items of <expected>, and that the
+        positions, data and labels of each item are in the same place."""
+        self.assertEqual(len(self.layer), len(expected))
+        self.assertEqual(len(self.layer.data), len(expected))
+        self.assertEqual(len(self.layer.labels), len(expected))
+        self.assertEqual(set(self.layer.items), set(expected))
+        for index, item in enumerate(self.layer.items):
+            self.assertEqual(self.layer.positions[item], index)
+            self.assertEqual(self.layer.data[index], expected[item])
+            self.assertEqual(self.layer.label(item), f"item {item}")
+
+    def test_adding_and_removing(self):
+        for item in range(5):
+            self.layer.add(item, (item, item), f"item {item}")
+        # the last item is swapped into the place of the removed one
+        self.assertTrue(self.layer.remove(1))
+        self.assertEqual(self.layer.items, [0, 4, 2, 3])
+        # removing the last item does not swap anything
+        self.assertTrue(self.layer.remove(3))
+        self.assertEqual(self.layer.items, [0, 4, 2])
+        self.assertFalse(self.layer.remove(3))
+        self.assertNotIn(3, self.layer)
+        self.assert_consistent({item: (item, item) for item in (0, 2, 4)})
+
+    def test_adding_an_item_again_does_nothing(self):
+        self.layer.add(1, (1, 1), "item 1")
+        self.layer.add(1, (2, 2), "other label")
+        self.assert_consistent({1: (1, 1)})
+
+    def test_random_changes(self):
+        rng = random.Random(0)
+        expected = {}
+        for _ in range(1000):
+            item = rng.randrange(50)
+            if rng.random() < 0.5:
+                self.layer.add(item, (item, -item), f"item {item}")
+                expected.setdefault(item, (item, -item))
+            else:
+                self.assertEqual(self.layer.remove(item), item in expected)
+                expected.pop(item, None)
+        self.assert_consistent(expected)
+
+    def test_layer_must_update_its_collection(self):
+        class IncompleteLayer(_Layer):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteLayer()
+
+    def test_collection_follows_items(self):
+        layer = PointLayer(Figure().add_subplot())
+        for item in range(3):
+            layer.add(item, (item, 2 * item))
+        layer.remove(0)
+        self.assertTrue(layer.changed)
+        layer.update()
+        self.assertFalse(layer.changed)
+        self.assertEqual(layer.collection.get_offsets().tolist(), [[2, 4], [1, 2]])
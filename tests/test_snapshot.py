@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from shapely import LineString, Point
+
+from src.transit_app.network import Network
+from src.transit_app.snapshot import load_snapshot, save_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "network.tnet")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        network = Network()
+        network.add_roads_bulk([((0, 1), (4, 1)), ((1, 0), (1, 2)), ((3, 0), (3, 2)),
+                                ((10, 10), (12, 10))])
+        save_snapshot(network, self.path)
+        loaded = load_snapshot(self.path)
+
+        self.assertEqual(set(loaded.roads), set(network.roads))
+        self.assertEqual(loaded.points, network.points)
+        self.assertEqual(loaded.crossroads, network.crossroads)
+        self.assertEqual(loaded.stats, network.stats)
+        self.assertTrue(loaded.connected(Point(1, 0), Point(3, 2)))
+        self.assertFalse(loaded.connected(Point(1, 0), Point(11, 10)))
+        output = loaded.find_shortest_path(Point(1, 0), Point(3, 2))
+        self.assertAlmostEqual(output.end_distance, 4)
+
+        # the loaded network can still be changed
+        loaded.add_point(Point(4, 1))
+        loaded.add_point(Point(4, 3))
+        self.assertIn(LineString([(4, 1), (4, 3)]), loaded.roads)
+        self.assertTrue(loaded.connected(Point(1, 0), Point(4, 3)))
+
+    def test_saving_does_not_change_network(self):
+        network = Network(cache_size=0)
+        # roads that are split one at a time, so that the routing graph has removed nodes
+        network.add_roads_bulk([((0, 1), (20, 1)), ((0, 2), (20, 2))])
+        for x in range(1, 20, 2):
+            network.add_point(Point(x, 0))
+            network.add_point(Point(x, 3))
+        network.build_contraction_hierarchy()
+        node_ids = dict(network.routing_graph.node_ids)
+        save_snapshot(network, self.path)
+
+        self.assertEqual(network.routing_graph.node_ids, node_ids)
+        for x in range(1, 19, 2):
+            point1, point2 = Point(x + 0.5, 1), Point(20 - x, 2.5)
+            expected = network.find_shortest_path(point1, point2).end_distance
+            output = network.find_shortest_path(point1, point2, algorithm="ch")
+            self.assertFalse(output.error)
+            self.assertAlmostEqual(output.end_distance, expected)
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a snapshot" * 10)
+        with self.assertRaises(ValueError):
+            load_snapshot(self.path)
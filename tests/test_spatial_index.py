@@ -0,0 +1,54 @@
+import unittest
+
+from shapely import LineString, Point
+
+from src.transit_app.spatial_index import MIN_REBUILD_SIZE, SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.index = SpatialIndex()
+
+    def test_query_finds_nearby_geometries(self):
+        road1 = LineString([(0, 0), (1, 1)])
+        road2 = LineString([(5, 5), (6, 5)])
+        self.index.insert(road1)
+        self.index.insert(road2)
+        self.assertEqual(self.index.query(
+            Point(0.5, 0.6), "dwithin", 0.2), [road1])
+        self.assertEqual(self.index.query(Point(3, 3), "dwithin", 0.2), [])
+
+    def test_results_are_in_insertion_order_after_rebuild(self):
+        points = [Point(i, 0) for i in range(MIN_REBUILD_SIZE * 3)]
+        for point in points:
+            self.index.insert(point)
+        found = self.index.query(LineString([(0, 0), (10, 0)]), "intersects")
+        self.assertEqual(found, points[:11])
+
+    def test_removed_geometries_are_not_found(self):
+        points = [Point(i, 0) for i in range(MIN_REBUILD_SIZE * 3)]
+        for point in points:
+            self.index.insert(point)
+        self.index.remove(points[1])
+        self.index.remove(points[-1])
+        self.assertEqual(len(self.index), len(points) - 2)
+        self.assertNotIn(points[1], self.index)
+        self.assertEqual(self.index.query(
+            Point(1, 0), "dwithin", 1.5), [points[0], points[2]])
+        self.assertEqual(self.index.query(points[-1]), [])
+
+    def test_query_many_is_like_query(self):
+        points = [Point(i, 0) for i in range(MIN_REBUILD_SIZE * 3 + 5)]
+        for point in points:
+            self.index.insert(point)
+        # some points are in the tree, some only in the buffer, and some are removed
+        self.index.remove(points[10])
+        self.index.remove(points[-2])
+        geometries = [Point(10, 0.5), LineString([(0, 1), (5, 1)]), Point(len(points) - 2, 0),
+                      Point(50, 50)]
+        self.assertEqual(self.index.query_many(geometries, "dwithin", 1.5),
+                         [self.index.query(geometry, "dwithin", 1.5) for geometry in geometries])
+        self.assertEqual(self.index.query_many([LineString([(2, -1), (4, 1)])]),
+                         [points[2:5]])
+        self.assertEqual(SpatialIndex().query_many(geometries), [[], [], [], []])